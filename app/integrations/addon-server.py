@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Warm add-on server for Atlas.
+
+Keeps the email and Signal add-ons loaded in one resident process and serves
+their short agent-facing commands (email send/reply/threads/thread, signal
+send/incoming/contacts/history) over a local UNIX socket. Config (reloaded
+when config.yml changes), SQLite connections (already migrated) and logged-in
+SMTP sessions stay warm, so a tool call costs a socket round trip instead of a
+Python start, heavy imports, YAML parsing and schema setup.
+
+Optional: `app/bin/email` and `app/bin/signal` fall back to in-process
+execution when this server isn't running. See addon_rpc.py for the protocol.
+
+Run as a supervisord service:
+  python3 -u /atlas/app/integrations/addon-server.py
+"""
+
+import importlib.util
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import addon_rpc  # noqa: E402
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
+
+
+# --- Per-request stdout/stderr capture ---
+
+class ThreadLocalStream:
+    """Stream proxy that writes to a per-thread buffer while a request is being served."""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buf = io.StringIO()
+        return self._local.buf
+
+    def release(self):
+        self._local.buf = None
+
+    def _target(self):
+        return getattr(self._local, "buf", None) or self._default
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+# --- Add-on modules ---
+
+def load_addon(name, path):
+    """Import an add-on script (hyphenated filename) as a module with warm caching on."""
+    spec = importlib.util.spec_from_file_location(f"{name}_addon", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.KEEP_WARM = True
+    return module
+
+
+ADDONS = {}    # name -> module
+WATCHERS = {}  # name -> ConfigWatcher (reloads on config.yml change)
+
+
+def run_command(addon, argv):
+    """Run one add-on CLI invocation in this thread. Returns the response dict."""
+    config = WATCHERS[addon].get()  # outside capture: reload notices go to the server log
+    out = sys.stdout.capture()
+    err = sys.stderr.capture()
+    code = 0
+    try:
+        ADDONS[addon].main(argv, config=config)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        sys.stdout.release()
+        sys.stderr.release()
+    return {"stdout": out.getvalue(), "stderr": err.getvalue(), "exit": code}
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            req = json.loads(line)
+            addon, argv = req["addon"], list(req["argv"])
+        except (ValueError, KeyError, TypeError):
+            self.reply({"stderr": "ERROR: malformed request\n", "exit": 2})
+            return
+
+        if addon not in ADDONS or not argv or argv[0] not in addon_rpc.SERVED_COMMANDS[addon]:
+            self.reply({"fallback": True})
+            return
+
+        self.reply(run_command(addon, argv))
+
+    def reply(self, resp):
+        self.wfile.write(json.dumps(resp).encode() + b"\n")
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    for name, path in addon_rpc.ADDON_SCRIPTS.items():
+        ADDONS[name] = load_addon(name, path)
+        WATCHERS[name] = ADDONS[name].ConfigWatcher()
+
+    sys.stdout = ThreadLocalStream(sys.stdout)
+    sys.stderr = ThreadLocalStream(sys.stderr)
+
+    path = addon_rpc.SOCKET_PATH
+    if os.path.exists(path):
+        os.unlink(path)
+
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+
+    log(f"Add-on server listening (socket={path}, addons={', '.join(ADDONS)})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Thin client for the warm add-on server (addon-server.py).
+
+`app/bin/email` and `app/bin/signal` run this instead of the add-on scripts.
+Short agent-facing commands are forwarded over a local UNIX socket to the
+resident server, which already has config, DB connections and SMTP sessions
+open. Everything else — and every command when the server isn't running —
+is exec'd in-process exactly as before.
+
+Usage:
+  addon_rpc.py <email|signal> <subcommand> [args...]
+
+Wire protocol: one JSON line per request, one JSON line per response.
+  → {"addon": "email", "argv": ["threads", "--limit", "5"]}
+  ← {"stdout": "...", "stderr": "...", "exit": 0}
+
+This module must stay import-light: it runs on every CLI call.
+"""
+
+import json
+import os
+import socket
+import sys
+
+SOCKET_PATH = os.environ.get("ATLAS_ADDON_SOCKET", "/tmp/atlas-addons.sock")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+ADDON_SCRIPTS = {
+    "email": os.path.join(_HERE, "email", "email-addon.py"),
+    "signal": os.path.join(_HERE, "signal", "signal-addon.py"),
+}
+
+# Short-lived commands worth serving warm. Long-running ones (poll) stay in-process.
+SERVED_COMMANDS = {
+    "email": {"send", "reply", "threads", "thread", "show"},
+    "signal": {"send", "incoming", "contacts", "history"},
+}
+
+# Options whose values are file paths, resolved against the caller's cwd
+PATH_OPTIONS = {"--attach"}
+
+
+def absolutize_paths(argv):
+    """Resolve file arguments client-side — the server has a different cwd."""
+    out = []
+    expect_path = False
+    for arg in argv:
+        if expect_path:
+            out.append(os.path.abspath(arg))
+            expect_path = False
+        elif arg in PATH_OPTIONS:
+            out.append(arg)
+            expect_path = True
+        elif "=" in arg and arg.split("=", 1)[0] in PATH_OPTIONS:
+            opt, value = arg.split("=", 1)
+            out.append(f"{opt}={os.path.abspath(value)}")
+        else:
+            out.append(arg)
+    return out
+
+
+def call(addon, argv, timeout=300):
+    """Run a command on the warm server. Returns the response dict, or None if unreachable.
+
+    Once the request is sent the command may have run (e.g. an email went out),
+    so a lost response is reported as an error instead of falling back.
+    """
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        return None
+
+    with sock:
+        request = {"addon": addon, "argv": argv}
+        buf = b""
+        try:
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            while b"\n" not in buf:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        except OSError as e:
+            return {"stderr": f"ERROR: add-on server connection failed: {e}\n", "exit": 1}
+
+    if b"\n" not in buf:
+        return {"stderr": "ERROR: add-on server closed the connection\n", "exit": 1}
+    return json.loads(buf.split(b"\n", 1)[0])
+
+
+def exec_in_process(addon, argv):
+    """Replace this process with the add-on script (cold path)."""
+    script = ADDON_SCRIPTS[addon]
+    os.execv(sys.executable, [sys.executable, "-u", script, *argv])
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ADDON_SCRIPTS:
+        print(f"Usage: addon_rpc.py <{'|'.join(ADDON_SCRIPTS)}> <subcommand> [args...]",
+              file=sys.stderr)
+        sys.exit(2)
+
+    addon, argv = sys.argv[1], sys.argv[2:]
+    command = argv[0] if argv else ""
+
+    if command in SERVED_COMMANDS[addon] and os.path.exists(SOCKET_PATH):
+        resp = call(addon, absolutize_paths(argv))
+        if resp is not None and not resp.get("fallback"):
+            sys.stdout.write(resp.get("stdout", ""))
+            sys.stderr.write(resp.get("stderr", ""))
+            sys.exit(resp.get("exit", 1))
+
+    exec_in_process(addon, argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+"""
+Shared ingestion core for the channel add-ons (email, Signal).
+
+Each add-on is a channel adapter: it turns what its transport delivers into
+normalized messages and knows how to store them in its own database. Everything
+after that is the same for every channel and lives here once:
+
+  dedupe    claim the message's dedupe keys, count suppressed duplicates
+  journal   the channel row and an ingest_journal row commit together, so an
+            interrupted run resumes from the exact message and stage
+  inbox     atlas.db inbox rows for a whole batch in one transaction, one .wake
+  trigger   the channel trigger fired per message, with bounded retries —
+            or, by sender priority, coalesced per session (normal) or
+            rolled into a periodic digest (low), see PriorityRules; a
+            per-session rate cap sends runaway sessions (reply loops) to
+            the digest as well; with worker lanes (lanes.py) triggers of
+            different sessions fire concurrently
+  metrics   counters in the channel DB's state table (ingested,
+            duplicates_suppressed, triggers_fired, trigger_failures,
+            rate_limited); reply latency per message (reply_latency table:
+            stored and triggered here, answered via record_reply)
+
+Also shared: config.yml section loading, the mtime-based ConfigWatcher and the
+per-database connection pool used by the warm add-on server.
+
+A normalized message is a dict with at least:
+  sender       inbox sender (address / number)
+  dedupe_keys  keys identifying the message across redeliveries ([] = never deduped)
+  summary      short text for log lines
+plus whatever the adapter's store() needs.
+"""
+
+import email.utils
+import fnmatch
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent import futures
+from datetime import datetime
+from pathlib import Path
+
+ATLAS_DB_PATH = os.environ["HOME"] + "/.index/atlas.db"
+WAKE_PATH = os.environ["HOME"] + "/.index/.wake"
+TRIGGERS_DIR = str(Path(__file__).resolve().parents[1] / "triggers")
+MAX_DELIVERY_ATTEMPTS = 5
+RESUME_BATCH = 200  # journal rows delivered per batch when resuming
+DIGEST_ITEMS = 30   # latest messages listed in a low-priority digest
+RATE_WINDOW = 3600  # seconds covered by an adapter's per-session rate_limit
+LATENCY_KEEP_DAYS = 90  # reply_latency rows kept for the `latency` report
+
+sys.path.insert(0, TRIGGERS_DIR)
+import trigger  # noqa: E402  (app/triggers/trigger.py)
+
+
+# --- Config ---
+
+def load_section(path, section):
+    """The `section` mapping of config.yml ({} when missing or PyYAML is unavailable)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        import yaml
+    except ImportError:
+        return {}
+    with open(path) as f:
+        data = yaml.safe_load(f) or {}
+    return data.get(section) or {}
+
+
+class ConfigWatcher:
+    """Keeps a loaded config and reloads it when config.yml changes (mtime check)."""
+
+    def __init__(self, loader, path):
+        self.loader = loader
+        self.path = path
+        self._stamp = None
+        self._config = None
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self):
+        stamp = self._current_stamp()
+        if self._config is None or stamp != self._stamp:
+            if self._config is not None:
+                print(f"[{datetime.now()}] Config changed, reloading {self.path}")
+            self._config = self.loader()
+            self._stamp = stamp
+        return self._config
+
+
+# --- Channel database ---
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection that goes back to the warm pool on close() (add-on server only)."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        self.rollback()
+        self.pool.append(self)
+
+
+_db_pools = {}         # db_path -> idle PooledConnections (keep_warm only)
+_schema_ready = set()  # db paths already migrated by this process
+
+CORE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS state (
+        key   TEXT PRIMARY KEY,
+        value TEXT NOT NULL DEFAULT ''
+    );
+
+    -- Dedupe keys of ingested messages (formats are channel-specific)
+    CREATE TABLE IF NOT EXISTS dedupe (
+        key        TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+
+    -- Messages stored but not yet written to the inbox / triggered (see deliver)
+    CREATE TABLE IF NOT EXISTS ingest_journal (
+        record_id     INTEGER PRIMARY KEY,
+        session_key   TEXT NOT NULL DEFAULT '',
+        sender        TEXT NOT NULL DEFAULT '',
+        inbox_content TEXT NOT NULL DEFAULT '',
+        payload       TEXT NOT NULL DEFAULT '{}',
+        stage         TEXT NOT NULL DEFAULT 'stored',
+        notify        INTEGER NOT NULL DEFAULT 1,
+        attempts      INTEGER NOT NULL DEFAULT 0,
+        priority      TEXT NOT NULL DEFAULT 'normal',
+        created_at    TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+
+    -- Triggers fired per session within the last RATE_WINDOW (see rate_limited)
+    CREATE TABLE IF NOT EXISTS trigger_log (
+        session_key TEXT NOT NULL,
+        fired_at    TEXT NOT NULL DEFAULT (datetime('now'))
+    );
+    CREATE INDEX IF NOT EXISTS idx_trigger_log_session ON trigger_log(session_key, fired_at);
+
+    -- Inbound message → trigger → answering outbound message, unix times (see latency.py)
+    CREATE TABLE IF NOT EXISTS reply_latency (
+        record_id    INTEGER PRIMARY KEY,
+        session_key  TEXT NOT NULL,
+        contact      TEXT NOT NULL DEFAULT '',
+        trigger_name TEXT NOT NULL DEFAULT '',
+        sent_at      REAL,
+        stored_at    REAL NOT NULL,
+        triggered_at REAL,
+        reply_id     INTEGER,
+        replied_at   REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_reply_latency_open ON reply_latency(session_key, reply_id);
+    CREATE INDEX IF NOT EXISTS idx_reply_latency_stored ON reply_latency(stored_at);
+"""
+
+
+def open_db(db_path, migrate, keep_warm=False):
+    """Open a channel database in WAL mode (from the warm pool when keep_warm).
+
+    The core tables are created and `migrate(db)` — the channel's own schema —
+    runs once per path and process.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+    if keep_warm:
+        pool = _db_pools.setdefault(db_path, [])
+        try:
+            return pool.pop()
+        except IndexError:
+            pass
+
+    db = sqlite3.connect(db_path, factory=PooledConnection, check_same_thread=not keep_warm)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    if keep_warm:
+        db.pool = _db_pools[db_path]
+
+    if db_path in _schema_ready:
+        return db
+    _schema_ready.add(db_path)
+
+    db.executescript(CORE_SCHEMA)
+    add_missing_columns(db, "ingest_journal", {"priority": "TEXT NOT NULL DEFAULT 'normal'"})
+    migrate(db)
+    return db
+
+
+def add_missing_columns(db, table, columns):
+    """Add columns introduced after a table was first created (CREATE IF NOT EXISTS skips them)."""
+    existing = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    db.commit()
+
+
+def get_state(db, key, default=""):
+    row = db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def bump_counter(db, key):
+    """Increment an integer counter in the state table. Returns the new value."""
+    db.execute("""
+        INSERT INTO state (key, value) VALUES (?, '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    """, (key,))
+    return int(db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()[0])
+
+
+def claim_dedupe_keys(db, keys):
+    """Record dedupe keys for a message. Returns False if any key was already seen."""
+    fresh = True
+    for key in keys:
+        cursor = db.execute("INSERT INTO dedupe (key) VALUES (?) ON CONFLICT(key) DO NOTHING", (key,))
+        if cursor.rowcount == 0:
+            fresh = False
+    return fresh
+
+
+# --- Sender priority ---
+
+class PriorityRules:
+    """Sender priority classes compiled from a channel's `priority` config.
+
+    `high` and `low` are lists of rules; a message matching neither is normal,
+    and high wins over low. A rule is a sender pattern (address, domain, number
+    or glob, as in the whitelist), `header:<Name>` / `header:<Name>=<glob>`
+    (email), or `keyword:<text>` (subject or body, case-insensitive).
+
+    High fires at once. Normal waits batch_window seconds (0 = fire at once) and
+    all messages of a session that arrived meanwhile go out as one trigger. Low
+    is written to the inbox right away but triggers only as part of a digest,
+    fired once the oldest low message has waited digest_interval seconds.
+    """
+
+    CLASSES = ("high", "low")
+
+    def __init__(self, cfg=None):
+        cfg = cfg or {}
+        self.batch_window = int(cfg.get("batch_window", 0))
+        self.digest_interval = int(cfg.get("digest_interval", 3600))
+        self.rules = {name: self._compile(cfg.get(name) or []) for name in self.CLASSES}
+        self.header_names = tuple(sorted({h for r in self.rules.values() for h, _ in r["headers"]}))
+
+    @staticmethod
+    def _compile(patterns):
+        rules = {"senders": set(), "domains": set(), "glob": None, "headers": [], "keywords": []}
+        globs = []
+        for pattern in patterns:
+            pattern = str(pattern).strip()
+            kind, _, value = pattern.partition(":")
+            if kind.lower() == "header" and value:
+                name, _, glob = value.partition("=")
+                rules["headers"].append((name.strip(), re.compile(fnmatch.translate(glob.strip().lower() or "*"))))
+            elif kind.lower() == "keyword" and value:
+                rules["keywords"].append(value.strip().lower())
+            elif "*" in pattern or "?" in pattern:
+                globs.append(fnmatch.translate(pattern.lower()))
+            elif pattern:
+                rules["senders"].add(pattern.lower())
+                if "@" not in pattern:
+                    rules["domains"].add(pattern.lower())
+        rules["glob"] = re.compile("|".join(globs)) if globs else None
+        return rules
+
+    def _matches(self, rules, sender, headers, text):
+        if sender in rules["senders"]:
+            return True
+        if "@" in sender and sender.rsplit("@", 1)[1] in rules["domains"]:
+            return True
+        if rules["glob"] and rules["glob"].match(sender):
+            return True
+        for name, glob in rules["headers"]:
+            value = headers.get(name.lower())
+            if value is not None and glob.match(value.strip().lower()):
+                return True
+        return any(k in text for k in rules["keywords"])
+
+    def classify(self, message):
+        """"high", "normal" or "low" for a normalized message."""
+        _, sender = email.utils.parseaddr(message["sender"])
+        sender = (sender or message["sender"]).lower()
+        headers = {k.lower(): str(v) for k, v in (message.get("headers") or {}).items()}
+        text = f"{message.get('summary', '')}\n{message.get('body', '')}".lower()
+        for name in self.CLASSES:
+            if self._matches(self.rules[name], sender, headers, text):
+                return name
+        return "normal"
+
+    def defers(self, priority):
+        return priority == "low" or (priority == "normal" and self.batch_window > 0)
+
+
+# --- Channel adapter ---
+
+class ChannelAdapter:
+    """One channel's side of ingestion. Subclasses set the attributes and implement store()."""
+
+    channel = ""       # atlas inbox channel, e.g. "email"
+    trigger_name = ""  # trigger fired once per message
+    record_table = ""  # channel table with id + inbox_msg_id columns
+    priority = None    # PriorityRules, or None to fire every message at once
+    digest_session_key = "low-priority-digest"
+    rate_limit = 0     # max triggers per session per RATE_WINDOW, more go to the digest (0 = off)
+    lanes = None       # lanes.KeyedExecutor: fire triggers of different sessions concurrently
+
+    def classify(self, message):
+        """Priority class of a message: "high", "normal", "low" or "silent" (store, never trigger)."""
+        return self.priority.classify(message) if self.priority else "normal"
+
+    def store(self, db, message):
+        """Write a normalized message to the channel DB without committing.
+
+        Returns {"id", "session_key", "inbox_content", "payload"} — payload is a
+        dict; inbox_message_id is added once the inbox row exists. Optional:
+        "contact" (defaults to the sender) and "sent_at" (unix time the sender
+        sent it) for the latency report.
+        """
+        raise NotImplementedError
+
+    def checkpoint(self, db, message):
+        """Record the transport position of a handled message (stored or duplicate)."""
+
+    def discard(self, message):
+        """Release whatever a message that won't be stored holds (e.g. staged files)."""
+
+    def fire(self, payload, session_key):
+        return fire_trigger(self.trigger_name, payload, session_key)
+
+    def connect(self):
+        """A new connection to the channel DB, for trigger jobs running on `lanes`."""
+        raise NotImplementedError
+
+
+# --- Ingest + delivery ---
+#
+# Each stored message gets a journal row that moves through two checkpoints:
+#   stored → inbox row written (atlas.db) → trigger fired (row deleted)
+# Every step commits on its own, so a crash or OOM resumes from the exact
+# message and stage instead of redoing (and duplicating) the whole batch.
+# Rows with notify=0 (e.g. a catch-up backlog) stop after the inbox write.
+
+def ingest(db, adapter, message, notify=True):
+    """Dedupe, store and journal one message in a single transaction.
+
+    Returns the record id (deliver it with deliver()), or None for a duplicate.
+    """
+    if not claim_dedupe_keys(db, message["dedupe_keys"]):
+        adapter.discard(message)
+        total = bump_counter(db, "duplicates_suppressed")
+        adapter.checkpoint(db, message)
+        db.commit()
+        print(f"[{datetime.now()}] Skipped duplicate {adapter.channel} message from "
+              f"{message['sender']}: {message['summary'][:60]} ({total} suppressed so far)")
+        return None
+
+    priority = adapter.classify(message)
+    if priority == "silent":
+        notify = False
+    record = adapter.store(db, message)
+    db.execute("""
+        INSERT INTO ingest_journal (record_id, session_key, sender, inbox_content, payload, notify, priority)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (record["id"], record["session_key"], message["sender"], record["inbox_content"],
+          json.dumps(record["payload"]), int(notify), priority))
+    if notify:
+        db.execute("""
+            INSERT OR REPLACE INTO reply_latency (record_id, session_key, contact, trigger_name, sent_at, stored_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (record["id"], record["session_key"], record.get("contact", message["sender"]),
+              adapter.trigger_name, record.get("sent_at"), time.time()))
+    adapter.checkpoint(db, message)
+    bump_counter(db, "ingested")
+    db.commit()
+    return record["id"]
+
+
+def _write_inbox(channel, rows, recover):
+    """Insert inbox rows in one atlas.db transaction. Returns {record_id: inbox id}.
+
+    With recover=True, rows an interrupted run already wrote (atlas.db commits
+    separately from the channel DB) are found instead of written twice.
+    """
+    atlas_db = sqlite3.connect(ATLAS_DB_PATH)
+    atlas_db.execute("PRAGMA busy_timeout=5000")
+    inbox_ids = {}
+    try:
+        for record_id, sender, content, created_at in rows:
+            found = None
+            if recover:
+                found = atlas_db.execute("""
+                    SELECT id FROM messages
+                    WHERE channel = ? AND sender = ? AND content = ? AND created_at >= ?
+                    ORDER BY id DESC LIMIT 1
+                """, (channel, sender, content, created_at)).fetchone()
+            if found:
+                inbox_ids[record_id] = found[0]
+            else:
+                inbox_ids[record_id] = atlas_db.execute(
+                    "INSERT INTO messages (channel, sender, content) VALUES (?, ?, ?)",
+                    (channel, sender, content),
+                ).lastrowid
+        atlas_db.commit()
+    finally:
+        atlas_db.close()
+    # Touch .wake so main session picks up the messages even if a trigger fails
+    Path(WAKE_PATH).touch()
+    return inbox_ids
+
+
+def deliver(db, adapter, record_ids, recover=False):
+    """Advance journaled messages through the inbox and trigger checkpoints.
+
+    Messages whose priority class defers them stay journaled (stage 'deferred')
+    until flush_deferred() fires them.
+    """
+    if not record_ids:
+        return
+    marks = ",".join("?" * len(record_ids))
+    rows = db.execute(f"""
+        SELECT record_id, session_key, sender, inbox_content, payload, stage, notify, created_at, priority
+        FROM ingest_journal WHERE record_id IN ({marks}) AND stage != 'deferred' ORDER BY record_id
+    """, list(record_ids)).fetchall()
+
+    stored = [(r[0], r[2], r[3], r[7]) for r in rows if r[5] == "stored"]
+    if stored:
+        inbox_ids = _write_inbox(adapter.channel, stored, recover)
+        for record_id, inbox_id in inbox_ids.items():
+            db.execute(f"UPDATE {adapter.record_table} SET inbox_msg_id = ? WHERE id = ?",
+                       (inbox_id, record_id))
+            db.execute("UPDATE ingest_journal SET stage = 'inbox' WHERE record_id = ?", (record_id,))
+        db.commit()
+        notified = {r[0]: r[1] for r in rows if r[6]}
+        for record_id, inbox_id in inbox_ids.items():
+            if record_id in notified:
+                print(f"[{datetime.now()}] {adapter.channel} {record_id} written to inbox "
+                      f"(session={notified[record_id]}, inbox={inbox_id})")
+
+    due = []
+    for record_id, session_key, _, _, payload, _, notify, _, priority in rows:
+        if not notify:
+            db.execute("DELETE FROM ingest_journal WHERE record_id = ?", (record_id,))
+            db.commit()
+        elif priority == "low" or (adapter.priority and adapter.priority.defers(priority)):
+            db.execute("UPDATE ingest_journal SET stage = 'deferred' WHERE record_id = ?", (record_id,))
+            db.commit()
+            print(f"[{datetime.now()}] {adapter.channel} {record_id} deferred ({priority} priority)")
+        else:
+            due.append((record_id, session_key, payload))
+
+    # With lanes, sessions fire concurrently — in record order within each session
+    if adapter.lanes is None or len({session_key for _, session_key, _ in due}) < 2:
+        for record_id, session_key, payload in due:
+            _fire_record(db, adapter, record_id, session_key, payload)
+        return
+    jobs = [adapter.lanes.submit(session_key, _fire_on_lane, adapter, record_id, session_key, payload)
+            for record_id, session_key, payload in due]
+    futures.wait(jobs)
+    for job in jobs:
+        job.result()  # re-raise a lane's error here, as the serial path would
+
+
+def _fire_record(db, adapter, record_id, session_key, payload):
+    if not rate_limited(db, adapter, session_key, [record_id]):
+        _fire_journaled(db, adapter, [record_id],
+                        _with_inbox_id(db, adapter, record_id, payload), session_key)
+
+
+def _fire_on_lane(adapter, record_id, session_key, payload):
+    db = adapter.connect()  # connections stay on their thread
+    try:
+        _fire_record(db, adapter, record_id, session_key, payload)
+    finally:
+        db.close()
+
+
+def _with_inbox_id(db, adapter, record_id, payload):
+    inbox_msg_id = db.execute(f"SELECT inbox_msg_id FROM {adapter.record_table} WHERE id = ?",
+                              (record_id,)).fetchone()[0]
+    return {"inbox_message_id": inbox_msg_id, **json.loads(payload)}
+
+
+def _fire_journaled(db, adapter, record_ids, payload_data, session_key):
+    """Fire one trigger for journaled messages; drop them on success, count the attempt otherwise."""
+    marks = ",".join("?" * len(record_ids))
+    if adapter.fire(json.dumps(payload_data), session_key):
+        db.execute(f"DELETE FROM ingest_journal WHERE record_id IN ({marks})", record_ids)
+        bump_counter(db, "triggers_fired")
+        digest = session_key == adapter.digest_session_key
+        db.execute(f"UPDATE reply_latency SET triggered_at = ?, trigger_name = ? "
+                   f"WHERE record_id IN ({marks}) AND triggered_at IS NULL",
+                   [time.time(), adapter.trigger_name + (":digest" if digest else ""), *record_ids])
+        if adapter.rate_limit and session_key != adapter.digest_session_key:
+            db.execute("INSERT INTO trigger_log (session_key) VALUES (?)", (session_key,))
+    else:
+        bump_counter(db, "trigger_failures")
+        attempts = db.execute(
+            f"UPDATE ingest_journal SET attempts = attempts + 1 WHERE record_id IN ({marks}) "
+            f"RETURNING attempts", record_ids,
+        ).fetchall()
+        if max(a for (a,) in attempts) >= MAX_DELIVERY_ATTEMPTS:
+            print(f"[{datetime.now()}] Giving up on trigger for {adapter.channel} "
+                  f"{', '.join(map(str, record_ids))} after {MAX_DELIVERY_ATTEMPTS} attempts "
+                  f"(inbox rows are kept)")
+            db.execute(f"DELETE FROM ingest_journal WHERE record_id IN ({marks})", record_ids)
+    db.commit()
+
+
+def rate_limited(db, adapter, session_key, record_ids):
+    """Demote messages to the low-priority digest when their session hit the rate cap.
+
+    A session that already triggered adapter.rate_limit times within RATE_WINDOW
+    is most likely a loop (an auto-responder answering every reply); its further
+    messages stay in the inbox but only reach the agent through the digest.
+    Returns True when the messages were demoted.
+    """
+    if not adapter.rate_limit:
+        return False
+    window = f"-{RATE_WINDOW} seconds"
+    db.execute("DELETE FROM trigger_log WHERE fired_at < datetime('now', ?)", (window,))
+    fired = db.execute(
+        "SELECT COUNT(*) FROM trigger_log WHERE session_key = ? AND fired_at >= datetime('now', ?)",
+        (session_key, window),
+    ).fetchone()[0]
+    if fired < adapter.rate_limit:
+        return False
+    marks = ",".join("?" * len(record_ids))
+    db.execute(f"UPDATE ingest_journal SET stage = 'deferred', priority = 'low' "
+               f"WHERE record_id IN ({marks})", record_ids)
+    total = bump_counter(db, "rate_limited")
+    db.commit()
+    print(f"[{datetime.now()}] Rate cap: {adapter.channel} session {session_key} fired {fired} "
+          f"trigger(s) within {RATE_WINDOW // 60} min; {len(record_ids)} message(s) moved to the "
+          f"low-priority digest ({total} so far)")
+    return True
+
+
+def flush_deferred(db, adapter):
+    """Fire deferred triggers that are due: per-session batches and the low-priority digest.
+
+    Called on every poll cycle (and periodically by long-running listeners).
+    """
+    rules = adapter.priority or PriorityRules()
+
+    # Normal: one trigger per session once its oldest message waited batch_window
+    due = [r[0] for r in db.execute("""
+        SELECT session_key FROM ingest_journal WHERE stage = 'deferred' AND priority = 'normal'
+        GROUP BY session_key HAVING MIN(created_at) <= datetime('now', ?)
+    """, (f"-{rules.batch_window} seconds",))]
+    for session_key in due:
+        rows = db.execute("""
+            SELECT record_id, payload FROM ingest_journal
+            WHERE stage = 'deferred' AND priority = 'normal' AND session_key = ? ORDER BY record_id
+        """, (session_key,)).fetchall()
+        if rate_limited(db, adapter, session_key, [r[0] for r in rows]):
+            continue
+        payloads = [_with_inbox_id(db, adapter, rid, payload) for rid, payload in rows]
+        payload_data = payloads[-1]
+        if len(payloads) > 1:
+            # Latest message on top; the earlier ones of the window without their context snapshots
+            payload_data["earlier_messages"] = [
+                {k: v for k, v in p.items() if k != "context"} for p in payloads[:-1]]
+        print(f"[{datetime.now()}] Firing {len(rows)} batched {adapter.channel} message(s) "
+              f"for {session_key}")
+        _fire_journaled(db, adapter, [r[0] for r in rows], payload_data, session_key)
+
+    # Low: one digest for all of them once the oldest waited digest_interval
+    oldest = db.execute("""
+        SELECT MIN(created_at) <= datetime('now', ?) FROM ingest_journal
+        WHERE stage = 'deferred' AND priority = 'low'
+    """, (f"-{rules.digest_interval} seconds",)).fetchone()[0]
+    if not oldest:
+        return
+    rows = db.execute("""
+        SELECT j.record_id, j.sender, j.inbox_content, j.created_at, r.inbox_msg_id
+        FROM ingest_journal j JOIN {table} r ON r.id = j.record_id
+        WHERE j.stage = 'deferred' AND j.priority = 'low' ORDER BY j.record_id
+    """.format(table=adapter.record_table)).fetchall()
+    senders = {}
+    for _, sender, _, _, _ in rows:
+        senders[sender] = senders.get(sender, 0) + 1
+    payload_data = {
+        "digest": True,
+        "priority": "low",
+        "summary": f"{len(rows)} low-priority {adapter.channel} message(s) since {rows[0][3]} UTC. "
+                   f"They are in the inbox; no per-message trigger was fired.",
+        "message_count": len(rows),
+        "top_senders": [{"sender": s, "count": n}
+                        for s, n in sorted(senders.items(), key=lambda x: -x[1])[:10]],
+        "messages": [{"inbox_message_id": inbox_id, "sender": sender, "preview": " ".join(content.split())[:200]}
+                     for _, sender, content, _, inbox_id in rows[-DIGEST_ITEMS:]],
+    }
+    print(f"[{datetime.now()}] Firing low-priority {adapter.channel} digest ({len(rows)} message(s))")
+    _fire_journaled(db, adapter, [r[0] for r in rows], payload_data, adapter.digest_session_key)
+
+
+def resume_journal(db, adapter):
+    """Finish messages that an interrupted run stored but never delivered."""
+    pending = [r[0] for r in db.execute("SELECT record_id FROM ingest_journal ORDER BY record_id")]
+    if pending:
+        print(f"[{datetime.now()}] Resuming {len(pending)} interrupted {adapter.channel} message(s)")
+    for i in range(0, len(pending), RESUME_BATCH):
+        deliver(db, adapter, pending[i:i + RESUME_BATCH], recover=True)
+
+
+def record_reply(db, session_key, reply_id):
+    """Mark the session's unanswered inbound messages as answered by outbound row `reply_id`.
+
+    Called by the add-ons' send/reply commands inside their own transaction
+    (caller commits); also drops rows older than LATENCY_KEEP_DAYS.
+    """
+    now = time.time()
+    db.execute("UPDATE reply_latency SET reply_id = ?, replied_at = ? WHERE session_key = ? AND reply_id IS NULL",
+               (reply_id, now, session_key))
+    db.execute("DELETE FROM reply_latency WHERE stored_at < ?", (now - LATENCY_KEEP_DAYS * 86400,))
+
+
+# --- Trigger dispatch ---
+
+def fire_trigger(trigger_name, payload, session_key):
+    """Fire a trigger non-blocking (each session key gets its own trigger session)."""
+    try:
+        outcome = trigger.fire(trigger_name, payload, session_key)
+        print(f"[{datetime.now()}] Trigger {outcome} for {session_key}")
+        return True
+    except Exception as e:
+        print(f"[{datetime.now()}] Failed to fire trigger for {session_key}: {e}")
+        return False
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Export, import and online backup for the add-on SQLite databases.
+
+Used by the email and Signal add-ons (`export`, `import`, `backup` subcommands).
+Everything streams: export walks each table with a plain cursor inside one read
+transaction (a consistent snapshot that doesn't block WAL writers), import
+applies rows in batches with a commit per batch, and backup copies pages in
+small steps via the SQLite online backup API. Memory stays flat regardless of
+database size.
+
+NDJSON format — one header line, then one line per row:
+  {"format": "atlas-email", "version": 1, "exported_at": "...", "tables": [...]}
+  {"table": "threads", "row": {"thread_id": "...", ...}}
+BLOB values are written as {"$b64": "..."}.
+
+Monthly partitions (partitions.py) are part of the data: export appends their
+rows under the partitioned table's name — an import puts them back into the
+hot DB, the next archive run moves them out again — and backup copies the
+partition files next to the backup.
+"""
+
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+FORMAT_VERSION = 1
+IMPORT_BATCH = 500        # rows per INSERT batch / commit
+BACKUP_STEP_PAGES = 1024  # pages copied per backup step (4 MB with the default page size)
+BACKUP_STEP_SLEEP = 0.01  # seconds between steps
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "$b64" in value:
+        return base64.b64decode(value["$b64"])
+    return value
+
+
+# --- Export ---
+
+def _write_rows(cursor, table, out):
+    columns = [d[0] for d in cursor.description]
+    n = 0
+    for row in cursor:
+        record = {c: _encode(v) for c, v in zip(columns, row)}
+        out.write(json.dumps({"table": table, "row": record}, ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+def export_ndjson(db, kind, tables, out, partitions=()):
+    """Stream `tables` of `db`, then the `partitions` [(table, path)], to the text stream `out`.
+
+    Returns {table: rows}.
+    """
+    counts = {}
+    out.write(json.dumps({
+        "format": f"atlas-{kind}", "version": FORMAT_VERSION,
+        "exported_at": datetime.now().isoformat(timespec="seconds"), "tables": list(tables),
+    }) + "\n")
+
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN")  # one snapshot across all tables
+    try:
+        for table in tables:
+            counts[table] = _write_rows(db.execute(f"SELECT * FROM {table} ORDER BY rowid"), table, out)
+    finally:
+        db.rollback()
+    for table, path in partitions:
+        part = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True)
+        try:
+            counts[table] += _write_rows(part.execute(f"SELECT * FROM {table} ORDER BY rowid"), table, out)
+        finally:
+            part.close()
+    out.flush()
+    return counts
+
+
+# --- Import ---
+
+def _flush(db, table, columns, batch):
+    cursor = db.executemany(
+        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})", batch)
+    db.commit()
+    return cursor.rowcount
+
+
+def import_ndjson(db, kind, tables, fp):
+    """Apply an export from the text stream `fp`. Returns {table: (inserted, skipped)}.
+
+    Rows keep their primary keys; rows whose key already exists are skipped, so
+    re-running an import is harmless. Columns unknown to this schema are dropped.
+    """
+    header = json.loads(fp.readline() or "{}")
+    if header.get("format") != f"atlas-{kind}":
+        raise ValueError(f"not an atlas-{kind} export (format={header.get('format')!r})")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"export version {header['version']} is newer than this add-on")
+
+    known = {t: {r[1] for r in db.execute(f"PRAGMA table_info({t})")} for t in tables}
+    counts = {}
+    table = columns = None
+    batch = []
+    total = 0
+
+    def flush():
+        if batch:
+            inserted = _flush(db, table, columns, batch)
+            done, skipped = counts.get(table, (0, 0))
+            counts[table] = (done + inserted, skipped + len(batch) - inserted)
+            batch.clear()
+
+    for line in fp:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.get("table") not in known:
+            continue
+        row = {c: _decode(v) for c, v in record["row"].items() if c in known[record["table"]]}
+        key = (record["table"], tuple(row))
+        if key != (table, columns) or len(batch) >= IMPORT_BATCH:
+            flush()
+            table, columns = key
+        batch.append(tuple(row.values()))
+        total += 1
+        if total % 10000 == 0:
+            print(f"[{datetime.now()}] Import progress: {total} row(s)", flush=True)
+    flush()
+    return counts
+
+
+# --- Online backup ---
+
+def online_backup(db, dest, pages=BACKUP_STEP_PAGES, sleep=BACKUP_STEP_SLEEP):
+    """Copy `db` to the file `dest` in small steps without blocking ingestion.
+
+    The source connection holds one read transaction for the whole copy: in WAL
+    mode that never blocks writers, and it pins the snapshot — otherwise every
+    write from the poller would restart the backup from page one. Writes go to
+    `<dest>.partial`, renamed into place when complete.
+    """
+    partial = f"{dest}.partial"
+    if os.path.exists(partial):
+        os.unlink(partial)
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+
+    last_report = time.monotonic()
+
+    def progress(status, remaining, total):
+        nonlocal last_report
+        if time.monotonic() - last_report >= 5:
+            last_report = time.monotonic()
+            print(f"[{datetime.now()}] Backup progress: {total - remaining}/{total} page(s)", flush=True)
+        time.sleep(sleep)  # yield between steps
+
+    if db.in_transaction:
+        db.commit()
+    target = sqlite3.connect(partial)
+    try:
+        db.execute("BEGIN")
+        db.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # take the read snapshot now
+        db.backup(target, pages=pages, progress=progress)
+        target.execute("PRAGMA journal_mode=DELETE")  # single self-contained file
+    finally:
+        db.rollback()
+        target.close()
+    os.replace(partial, dest)
+    return os.path.getsize(dest)
+
+
+def backup_partitions(paths, dest):
+    """Copy read-only partition files to <dest>.parts/ (where a restored DB looks for them)."""
+    if not paths:
+        return 0
+    directory = os.path.splitext(dest)[0] + ".parts"
+    os.makedirs(directory, exist_ok=True)
+    for path in paths:
+        target = os.path.join(directory, os.path.basename(path))
+        if os.path.exists(target):
+            os.chmod(target, 0o644)
+        shutil.copy2(path, target)
+    return len(paths)
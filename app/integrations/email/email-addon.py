@@ -6,63 +6,99 @@ Unified module for all email operations: polling IMAP, sending/replying via SMTP
 and thread tracking. Uses its own SQLite database per account.
 
 Subcommands:
-  poll   [--once]           Fetch new emails from IMAP, write to inbox, fire triggers
+  poll   [--once] [--catchup]  Fetch new emails from IMAP, write to inbox, fire triggers
+  receive [--listen H:P] [--smtp]  Accept pushed mail over LMTP/SMTP on a local port (no polling)
   send   <to> <subject> <body>   Send a new email
   reply  <thread_id> <body>      Reply to an existing thread
+  bulk-send <recipients> --subject T --body T  Mail-merge to a CSV/NDJSON recipient list
   threads [--limit N]       List tracked email threads
   thread <thread_id>        Show thread detail
-
-Concurrency: poll fetches all new UIDs first, writes them to the email DB and
-atlas inbox in a single pass, then fires triggers in the background (non-blocking)
-so parallel threads don't block each other.
+  show   <email_id> [--original]  Show one email (--original: incl. quoted history)
+  export [--output FILE]    Stream the account DB as NDJSON (default: stdout)
+  import <file|->           Load an NDJSON export (existing rows are kept)
+  import --mbox F | --maildir D  Bulk-import mail history (no inbox rows, no triggers)
+  backup <dest.db>          Online backup of the account DB, copied in small steps
+  partitions [--archive]    List monthly partitions / move old months out of the hot DB
+  latency [--days N]        Message-to-reply latency (ingest / trigger start / response)
+  profile-summary [--runs N]  Hottest functions / allocations of recent --profile runs
+
+Global option --profile (or ATLAS_PROFILE=1): cProfile + tracemalloc per command
+or poll cycle, written to ~/.index/profiles/email/ (see profiling.py).
+
+Concurrency: ingestion runs on the shared channel core (channel_core.py). Each
+email's DB row, the last UID and an ingest journal entry commit together; each
+fetched chunk is then written to the inbox in one transaction and its triggers
+fire (non-blocking, so parallel threads don't block each other), each step
+advancing the journal. An interrupted poll resumes from the exact message and stage.
 """
 
 import argparse
+import asyncio
+import base64
+import csv
 import email as emaillib
+import email.policy
 import email.utils
 import fnmatch
 import imaplib
+import itertools
 import json
+import mailbox
+import mimetypes
 import os
+import queue
 import re
+import shutil
 import signal
 import smtplib
-import sqlite3
 import subprocess
 import sys
+import tempfile
+import threading
 import time
-from datetime import datetime
-from email import encoders
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr, formatdate, make_msgid
 from pathlib import Path
+from string import Template
 
 # --- Paths ---
 CONFIG_PATH = os.environ["HOME"] + "/config.yml"
-ATLAS_DB_PATH = os.environ["HOME"] + "/.index/atlas.db"
 EMAIL_DB_DIR = os.environ["HOME"] + "/.index/email"
-WAKE_PATH = os.environ["HOME"] + "/.index/.wake"
-TRIGGER_SCRIPT = "/atlas/app/triggers/trigger.sh"
 TRIGGER_NAME = "email-handler"
+PARALLEL_PARSE_MIN = 4  # new emails in one poll before parsing moves to a process pool
+PREVIEW_CHARS = 1500      # body preview in inbox rows and trigger payloads; the full text stays in emails.body
+CONTEXT_MESSAGES = 8       # recent messages per thread snapshot sent with each trigger
+CONTEXT_TEXT_CHARS = 300   # per message in the snapshot
+CATCHUP_SESSION_KEY = "catchup-digest"
+CATCHUP_DIGEST_ITEMS = 20
+BULK_REPORTS_DIR = os.environ["HOME"] + "/.index/email/bulk"
+RECEIVE_TIMEOUT = 300     # seconds a `receive` client may stay silent (RFC 5321 allows 5 min)
+RECEIVE_FLUSH_INTERVAL = 15  # seconds between deferred-trigger checks in `receive`
 ATTACHMENTS_DIR = os.environ["HOME"] + "/.index/email/attachments"
-MESSAGES_DIR = os.environ["HOME"] + "/.index/email/messages"
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import channel_core  # noqa: E402  (app/integrations/channel_core.py)
+import dbtransfer  # noqa: E402  (app/integrations/dbtransfer.py)
+import lanes  # noqa: E402  (app/integrations/lanes.py)
+import latency  # noqa: E402  (app/integrations/latency.py)
+import partitions  # noqa: E402  (app/integrations/partitions.py)
+import profiling  # noqa: E402  (app/integrations/profiling.py)
+
+# Set by addon-server.py: keep DB connections and SMTP sessions open between commands
+KEEP_WARM = False
 
 
 # --- Config ---
 
 def load_config():
     """Load email config from config.yml, with env overrides."""
-    cfg = {}
-    if os.path.exists(CONFIG_PATH):
-        try:
-            import yaml
-            with open(CONFIG_PATH) as f:
-                data = yaml.safe_load(f) or {}
-            cfg = data.get("email", {})
-        except ImportError:
-            pass
+    cfg = channel_core.load_section(CONFIG_PATH, "email")
 
     config = {
         "imap_host": os.environ.get("EMAIL_IMAP_HOST", cfg.get("imap_host", "")),
@@ -73,8 +109,20 @@ def load_config():
         "password": os.environ.get("EMAIL_PASSWORD", ""),
         "password_file": cfg.get("password_file", ""),
         "folder": os.environ.get("EMAIL_FOLDER", cfg.get("folder", "INBOX")),
+        "folders": cfg.get("folders") or [],
         "whitelist": cfg.get("whitelist", []),
         "mark_read": cfg.get("mark_read", True),
+        "catchup_threshold": int(cfg.get("catchup_threshold", 25)),
+        "fetch_chunk": int(cfg.get("fetch_chunk", 50)),
+        "parse_workers": int(cfg.get("parse_workers", 0)) or min(os.cpu_count() or 1, 8),
+        "max_message_mb": float(cfg.get("max_message_mb", 35)),
+        "automated": str(cfg.get("automated", "digest")).lower(),
+        "thread_rate_limit": int(cfg.get("thread_rate_limit", 6)),
+        "hot_months": int(cfg.get("hot_months", 0)),
+        "bulk_connections": int(cfg.get("bulk_connections", 3)),
+        "bulk_rate": float(cfg.get("bulk_rate", 2)),
+        "lanes": int(cfg.get("lanes", 4)),
+        "receive_listen": str(cfg.get("receive_listen", "127.0.0.1:2424")),
     }
 
     if not config["password"] and config["password_file"]:
@@ -82,23 +130,38 @@ def load_config():
         if pf.exists():
             config["password"] = pf.read_text().strip()
 
+    if not config["folders"]:
+        config["folders"] = [config["folder"]]
+
+    config["whitelist_matcher"] = SenderMatcher(config["whitelist"])
+    config["priority_rules"] = channel_core.PriorityRules(cfg.get("priority"))
     return config
 
 
+def max_message_bytes(config):
+    """email.max_message_mb in bytes — decimal MB, for sending and receiving alike."""
+    return int(config["max_message_mb"] * 1e6)
+
+
+class ConfigWatcher(channel_core.ConfigWatcher):
+    """Email config, reloaded when config.yml changes."""
+
+    def __init__(self, loader=None, path=None):
+        super().__init__(loader or load_config, path or CONFIG_PATH)
+
+
 # --- Email Database ---
 
 def get_email_db(config):
     """Open (or create) the per-account email database."""
-    os.makedirs(EMAIL_DB_DIR, exist_ok=True)
-
     # Sanitize username for filename
     account = re.sub(r"[^a-zA-Z0-9@._-]", "_", config.get("username", "default"))
     db_path = os.path.join(EMAIL_DB_DIR, f"{account}.db")
+    return channel_core.open_db(db_path, lambda db: migrate_email_db(db, config), keep_warm=KEEP_WARM)
 
-    db = sqlite3.connect(db_path)
-    db.execute("PRAGMA journal_mode=WAL")
-    db.execute("PRAGMA busy_timeout=5000")
 
+def migrate_email_db(db, config):
+    """Email tables on top of the core ones (state, dedupe, ingest_journal)."""
     db.executescript("""
         CREATE TABLE IF NOT EXISTS threads (
             thread_id       TEXT PRIMARY KEY,
@@ -124,20 +187,42 @@ def get_email_db(config):
             body            TEXT NOT NULL DEFAULT '',
             headers_json    TEXT NOT NULL DEFAULT '{}',
             inbox_msg_id    INTEGER,
+            body_original   BLOB,
             created_at      TEXT NOT NULL DEFAULT (datetime('now')),
             FOREIGN KEY (thread_id) REFERENCES threads(thread_id)
         );
 
-        CREATE TABLE IF NOT EXISTS state (
-            key   TEXT PRIMARY KEY,
-            value TEXT NOT NULL DEFAULT ''
+        -- IMAP sync position per folder; uidnext/highestmodseq are from the last completed sync
+        CREATE TABLE IF NOT EXISTS folder_state (
+            folder        TEXT PRIMARY KEY,
+            uidvalidity   INTEGER NOT NULL DEFAULT 0,
+            uidnext       INTEGER NOT NULL DEFAULT 0,
+            highestmodseq INTEGER NOT NULL DEFAULT 0,
+            last_uid      INTEGER NOT NULL DEFAULT 0,
+            catchup_until INTEGER NOT NULL DEFAULT 0,
+            resync_since  TEXT NOT NULL DEFAULT '',
+            synced_at     TEXT
+        );
+
+        -- Last CONTEXT_MESSAGES emails per thread in compact form (see push_thread_context)
+        CREATE TABLE IF NOT EXISTS thread_context (
+            thread_id  TEXT PRIMARY KEY,
+            messages   TEXT NOT NULL DEFAULT '[]',
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
         );
 
         CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails(thread_id);
         CREATE INDEX IF NOT EXISTS idx_emails_direction ON emails(direction);
     """)
-
-    return db
+    db.executescript(partitions.CATALOG_SCHEMA)
+    channel_core.add_missing_columns(db, "emails", {"body_original": "BLOB"})
+    # Journal rows written before the shared core keyed by email/thread id
+    journal = {row[1] for row in db.execute("PRAGMA table_info(ingest_journal)")}
+    if "email_id" in journal:
+        db.execute("ALTER TABLE ingest_journal RENAME COLUMN email_id TO record_id")
+        db.execute("ALTER TABLE ingest_journal RENAME COLUMN thread_id TO session_key")
+        db.commit()
+    migrate_sync_state(db, config.get("folder", "INBOX"))
 
 
 # --- Thread helpers ---
@@ -226,6 +311,142 @@ def update_thread(db, thread_id, msg):
     }
 
 
+def sent_date(headers):
+    """The email's Date header as an aware datetime, or None if missing / unparsable."""
+    try:
+        sent = emaillib.utils.parsedate_to_datetime(headers.get("Date", ""))
+    except (TypeError, ValueError, IndexError):
+        return None
+    return sent if sent.tzinfo else sent.replace(tzinfo=timezone.utc)
+
+
+def compact_entry(direction, sender, body, created_at=None):
+    """One message in a context snapshot: direction, sender, UTC time and a short text."""
+    return {
+        "dir": direction,
+        "from": sender,
+        "at": (created_at or time.strftime("%Y-%m-%d %H:%M", time.gmtime()))[:16],
+        "text": " ".join(body.split())[:CONTEXT_TEXT_CHARS],
+    }
+
+
+def push_thread_context(db, thread_id, entry):
+    """Append one email to the thread's context snapshot (caller commits).
+
+    Returns the snapshot as it was before this email, so the trigger payload
+    carries the recent history without the session having to run `email thread`.
+    A thread without a snapshot yet is seeded from its stored emails; call this
+    before inserting the new email row.
+    """
+    row = db.execute("SELECT messages FROM thread_context WHERE thread_id = ?",
+                     (thread_id,)).fetchone()
+    if row:
+        previous = json.loads(row[0])
+    else:
+        rows = db.execute("""
+            SELECT direction, sender, body, created_at FROM emails
+            WHERE thread_id = ? ORDER BY id DESC LIMIT ?
+        """, (thread_id, CONTEXT_MESSAGES)).fetchall()
+        previous = [compact_entry(*r) for r in reversed(rows)]
+
+    db.execute("""
+        INSERT INTO thread_context (thread_id, messages, updated_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT(thread_id) DO UPDATE SET
+            messages = excluded.messages, updated_at = excluded.updated_at
+    """, (thread_id, json.dumps((previous + [entry])[-CONTEXT_MESSAGES:])))
+    return previous
+
+
+# --- Reply parsing ---
+#
+# Deep threads repeat the whole history in every message. Only the new part is
+# stored, written to the inbox and sent to the trigger; the full original is
+# kept compressed in emails.body_original (`email show <id> --original`).
+
+REPLY_HEADER_RES = [
+    re.compile(r"^On\b.{0,300}\bwrote:\s*$", re.IGNORECASE),        # On <date>, <name> wrote:
+    re.compile(r"^Am\b.{0,300}\bschrieb\b.{0,200}:\s*$", re.IGNORECASE),  # Am <Datum> schrieb <Name>:
+    re.compile(r"^-{2,}\s*(Original Message|Ursprüngliche Nachricht)\s*-{2,}\s*$", re.IGNORECASE),
+    re.compile(r"^_{10,}\s*$"),                                        # Outlook separator line
+]
+FORWARD_MARKER_RE = re.compile(r"^-{2,}\s*(Forwarded message|Weitergeleitete Nachricht)\s*-{2,}\s*$",
+                               re.IGNORECASE)
+HEADER_LINE_RE = re.compile(r"^(From|Von|Sent|Gesendet|Date|Datum|To|An|Cc|Subject|Betreff):\s", re.IGNORECASE)
+SIGNATURE_RES = [
+    re.compile(r"^-- ?$"),                                             # RFC 3676 delimiter
+    re.compile(r"^(Sent from my|Sent from Mail for|Get Outlook for|Von meinem \S+ gesendet)\b",
+               re.IGNORECASE),
+]
+SIGNATURE_MAX_LINES = 15
+
+
+def _is_reply_header(lines, i):
+    line = lines[i].strip()
+    if any(r.match(line) for r in REPLY_HEADER_RES):
+        return True
+    # Attribution wrapped over two lines ("On Mon, 1 Jan 2026, Alice <a@x>\nwrote:")
+    if i + 1 < len(lines) and re.match(r"^(On|Am)\b", line):
+        joined = f"{line} {lines[i + 1].strip()}"
+        return any(r.match(joined) for r in REPLY_HEADER_RES[:2])
+    # Outlook-style header block: From: followed by Sent:/Date: within two lines
+    if re.match(r"^(From|Von):\s", line):
+        following = [l.strip() for l in lines[i + 1:i + 3]]
+        return any(re.match(r"^(Sent|Gesendet|Date|Datum):\s", l) for l in following)
+    return False
+
+
+def split_reply(text):
+    """Split an email body into (new content, removed quote/signature text).
+
+    Cuts at the first reply attribution or original-message header, drops a
+    trailing block of ">"-quoted lines (interleaved quotes are kept), strips
+    a trailing signature and forwarded-message header blocks (the forwarded
+    body itself is kept). If nothing would be left, the text is returned as is.
+    """
+    lines = text.replace("\r\n", "\n").split("\n")
+    cut = len(lines)
+
+    for i in range(len(lines)):
+        if _is_reply_header(lines, i):
+            cut = i
+            break
+
+    # Trailing quoted block: from the first ">" line after which only quotes/blanks follow
+    end = cut
+    while end > 0 and (not lines[end - 1].strip() or lines[end - 1].lstrip().startswith(">")):
+        end -= 1
+    if any(l.lstrip().startswith(">") for l in lines[end:cut]):
+        cut = end
+
+    # Signature: delimiter within the last few lines of the new content
+    for i in range(max(0, cut - SIGNATURE_MAX_LINES), cut):
+        if any(r.match(lines[i].rstrip()) for r in SIGNATURE_RES):
+            cut = i
+            break
+
+    kept = lines[:cut]
+
+    # Forwarded messages: drop the marker and its header block, keep the forwarded body
+    out = []
+    i = 0
+    while i < len(kept):
+        if FORWARD_MARKER_RE.match(kept[i].strip()):
+            i += 1
+            while i < len(kept) and (HEADER_LINE_RE.match(kept[i].strip()) or not kept[i].strip()):
+                i += 1
+            out.append("[Forwarded message]")
+            continue
+        out.append(kept[i])
+        i += 1
+
+    new = "\n".join(out).strip()
+    if not new:
+        return text, ""
+    removed = "\n".join(lines[cut:]).strip()
+    return new, removed
+
+
 def get_body(msg):
     """Extract plaintext body from email message."""
     if msg.is_multipart():
@@ -244,13 +465,13 @@ def get_body(msg):
     return ""
 
 
-def extract_attachments(msg, thread_id):
+def extract_attachments(msg, thread_id, save_dir=None):
     """Extract and save attachments from an email. Returns list of attachment metadata."""
     if not msg.is_multipart():
         return []
 
     attachments = []
-    save_dir = os.path.join(ATTACHMENTS_DIR, thread_id)
+    save_dir = save_dir or os.path.join(ATTACHMENTS_DIR, thread_id)
 
     for part in msg.walk():
         content_disposition = part.get("Content-Disposition", "")
@@ -295,279 +516,1172 @@ def extract_attachments(msg, thread_id):
     return attachments
 
 
-def save_email_file(thread_id, sender, subject, date_str, body, attachments=None):
-    """Save incoming email as a searchable markdown file."""
-    thread_dir = os.path.join(MESSAGES_DIR, thread_id)
-    os.makedirs(thread_dir, exist_ok=True)
+def body_preview(body):
+    """First PREVIEW_CHARS of the body, cut at a word boundary. Returns (preview, truncated)."""
+    if len(body) <= PREVIEW_CHARS:
+        return body, False
+    cut = body[:PREVIEW_CHARS]
+    space = cut.rfind(" ", PREVIEW_CHARS // 2)
+    return (cut[:space] if space > 0 else cut).rstrip() + " …", True
+
+
+class SenderMatcher:
+    """Sender whitelist compiled for O(1) lookups.
+
+    Plain entries go into an exact-address set and a domain set (an entry
+    without "@" matches any address at exactly that domain); entries with
+    "*" or "?" are combined into one glob regex. An empty whitelist accepts all.
+    """
+
+    def __init__(self, patterns):
+        self.accept_all = not patterns
+        self.addresses = set()
+        self.domains = set()
+        globs = []
+        for pattern in patterns or []:
+            pattern = str(pattern).strip().lower()
+            if "*" in pattern or "?" in pattern:
+                globs.append(fnmatch.translate(pattern))
+            else:
+                self.addresses.add(pattern)
+                if "@" not in pattern:
+                    self.domains.add(pattern)
+        self.glob = re.compile("|".join(globs)) if globs else None
+
+    def matches(self, sender):
+        if self.accept_all:
+            return True
+        _, addr = emaillib.utils.parseaddr(sender)
+        addr = addr.lower()
+        if addr in self.addresses:
+            return True
+        if "@" in addr and addr.rsplit("@", 1)[1] in self.domains:
+            return True
+        return bool(self.glob and self.glob.match(addr))
 
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    filepath = os.path.join(thread_dir, f"{ts}.md")
 
-    lines = [
-        f"# {subject}",
-        "",
-        f"**From:** {sender}",
-        f"**Date:** {date_str}",
-        f"**Thread:** {thread_id}",
-    ]
+def is_whitelisted(sender, whitelist):
+    if not isinstance(whitelist, SenderMatcher):
+        whitelist = SenderMatcher(whitelist)
+    return whitelist.matches(sender)
 
-    if attachments:
-        lines.append("")
-        lines.append("**Attachments:**")
-        for a in attachments:
-            lines.append(f"- [{a['filename']}]({a['path']}) ({a['content_type']}, {a['size']} bytes)")
 
-    lines.append("")
-    lines.append("---")
-    lines.append("")
-    lines.append(body[:8000])
-    lines.append("")
+# --- Per-folder sync state ---
 
-    with open(filepath, "w") as f:
-        f.write("\n".join(lines))
+FOLDER_STATE_COLUMNS = ("uidvalidity", "uidnext", "highestmodseq", "last_uid",
+                        "catchup_until", "resync_since", "synced_at")
 
-    return filepath
 
+def migrate_sync_state(db, folder):
+    """Move the single-folder `last_uid` / `catchup_until_uid` state keys into folder_state.
 
-def is_whitelisted(sender, whitelist):
-    if not whitelist:
-        return True
-    _, addr = emaillib.utils.parseaddr(sender)
-    addr = addr.lower()
-    for w in whitelist:
-        w_lower = w.lower()
-        if "*" in w or "?" in w:
-            if fnmatch.fnmatch(addr, w_lower):
-                return True
-        elif addr == w_lower or addr.endswith(f"@{w_lower}"):
-            return True
-    return False
+    UIDVALIDITY was never stored, so the first poll adopts the server's value.
+    """
+    last_uid = channel_core.get_state(db, "last_uid")
+    if not last_uid:
+        return
+    catchup_until = channel_core.get_state(db, "catchup_until_uid", "0")
+    db.execute("""
+        INSERT INTO folder_state (folder, last_uid, catchup_until) VALUES (?, ?, ?)
+        ON CONFLICT(folder) DO NOTHING
+    """, (folder, int(last_uid), int(catchup_until)))
+    db.execute("DELETE FROM state WHERE key IN ('last_uid', 'catchup_until_uid')")
+    db.commit()
+
+
+def get_folder_state(db, folder):
+    row = db.execute(f"SELECT {', '.join(FOLDER_STATE_COLUMNS)} FROM folder_state WHERE folder = ?",
+                     (folder,)).fetchone()
+    if row is None:
+        return {"uidvalidity": 0, "uidnext": 0, "highestmodseq": 0, "last_uid": 0,
+                "catchup_until": 0, "resync_since": "", "synced_at": None}
+    return dict(zip(FOLDER_STATE_COLUMNS, row))
+
+
+def update_folder_state(db, folder, **values):
+    columns = ", ".join(values)
+    updates = ", ".join(f"{k} = excluded.{k}" for k in values)
+    db.execute(f"""
+        INSERT INTO folder_state (folder, {columns}) VALUES (?{', ?' * len(values)})
+        ON CONFLICT(folder) DO UPDATE SET {updates}
+    """, (folder, *values.values()))
 
 
-# --- Atlas inbox helper ---
+def set_last_uid(db, folder, uid):
+    update_folder_state(db, folder, last_uid=uid)
 
-def write_to_atlas_inbox(sender, content, thread_id):
-    """Write email to the main Atlas inbox. Returns message ID."""
-    atlas_db = sqlite3.connect(ATLAS_DB_PATH)
-    atlas_db.execute("PRAGMA busy_timeout=5000")
-    cursor = atlas_db.execute(
-        "INSERT INTO messages (channel, sender, content) VALUES (?, ?, ?)",
-        ("email", sender, content),
+
+# --- IMAP fetch ---
+
+def mailbox_status(mail, folder, condstore):
+    """One STATUS round trip — no SELECT. Returns {"uidvalidity", "uidnext", "highestmodseq"}."""
+    items = "(UIDVALIDITY UIDNEXT HIGHESTMODSEQ)" if condstore else "(UIDVALIDITY UIDNEXT)"
+    status, data = mail.status(folder, items)
+    if status != "OK" or not data or not data[0]:
+        raise imaplib.IMAP4.error(f"STATUS {folder} failed: {data}")
+    found = {k.lower(): int(v) for k, v in re.findall(rb"(\w+) (\d+)", data[0].split(b"(", 1)[-1])}
+    return {"uidvalidity": found.get(b"uidvalidity", 0),
+            "uidnext": found.get(b"uidnext", 0),
+            "highestmodseq": found.get(b"highestmodseq", 0)}
+
+
+def fetch_messages(mail, uids):
+    """Fetch a chunk of UIDs in one round trip. Yields (uid, raw) in UID order."""
+    status, data = mail.uid("fetch", ",".join(str(u) for u in uids), "(RFC822)")
+    if status != "OK":
+        return
+
+    fetched = {}
+    pending_raw = None
+    for item in data:
+        if isinstance(item, tuple):
+            match = re.search(rb"UID (\d+)", item[0])
+            if match:
+                fetched[int(match.group(1))] = item[1]
+            else:
+                pending_raw = item[1]  # some servers send UID after the literal
+        elif pending_raw is not None and item:
+            match = re.search(rb"UID (\d+)", item)
+            if match:
+                fetched[int(match.group(1))] = pending_raw
+            pending_raw = None
+
+    for uid in uids:
+        if uid in fetched:
+            yield uid, fetched.pop(uid)
+
+
+# --- Ingest one email ---
+#
+# Parsing is split from storing: parse_message (MIME parsing, body extraction,
+# quote stripping, attachment decoding and writing) is CPU-bound and runs in a
+# process pool during bursts; ingest_message applies the results to the DB one
+# by one, in UID order, in the polling process.
+
+HEADER_FIELDS = ("From", "Subject", "Date", "Message-ID", "References", "In-Reply-To")
+# Headers that mark mail as machine-generated (RFC 3834, RFC 2369/2919, common MTA/responder headers)
+AUTOMATED_HEADERS = ("Auto-Submitted", "Precedence", "List-Id", "List-Unsubscribe",
+                     "X-Autoreply", "X-Autorespond", "Return-Path")
+BOUNCE_SENDERS = ("mailer-daemon", "postmaster")
+STAGING_DIR = os.path.join(ATTACHMENTS_DIR, ".incoming")  # attachments of parsed, not yet stored emails
+
+_worker_matchers = {}  # whitelist tuple -> SenderMatcher (per worker process)
+
+
+def automated_kind(headers):
+    """Why an email looks machine-generated: "bounce", "auto-reply", "auto-generated",
+    "bulk" or "list" — or None for mail from a person."""
+    _, sender = emaillib.utils.parseaddr(headers.get("From", ""))
+    if headers.get("Return-Path", "").strip() == "<>" or sender.split("@")[0].lower() in BOUNCE_SENDERS:
+        return "bounce"
+    auto_submitted = headers.get("Auto-Submitted", "no").strip().lower()
+    precedence = headers.get("Precedence", "").strip().lower()
+    if (auto_submitted.startswith("auto-replied") or precedence == "auto_reply"
+            or "X-Autoreply" in headers or "X-Autorespond" in headers):
+        return "auto-reply"
+    if auto_submitted and not auto_submitted.startswith("no"):
+        return "auto-generated"
+    if precedence in ("bulk", "junk"):
+        return "bulk"
+    if precedence == "list" or "List-Id" in headers or "List-Unsubscribe" in headers:
+        return "list"
+    return None
+
+
+def parse_message(uid, raw, whitelist, extra_headers=(), staging_dir=STAGING_DIR):
+    """Parse one fetched email into a picklable dict (runs in a pool worker).
+
+    Attachments are decoded into a per-message staging directory; the writer
+    moves them into the thread's directory once the email is known to be new.
+    Blocked senders are detected here so their attachments are never written.
+    `extra_headers` are kept alongside HEADER_FIELDS (headers named in priority rules).
+    """
+    key = tuple(whitelist)
+    matcher = _worker_matchers.get(key) or _worker_matchers.setdefault(key, SenderMatcher(whitelist))
+
+    msg = emaillib.message_from_bytes(raw)
+    headers = {name: str(msg[name]) for name in HEADER_FIELDS + AUTOMATED_HEADERS + tuple(extra_headers)
+               if msg[name] is not None}
+    parsed = {"uid": uid, "headers": headers, "blocked": not matcher.matches(headers.get("From", "unknown"))}
+    if parsed["blocked"]:
+        return parsed
+    parsed["automated"] = automated_kind(headers)
+
+    full_body = get_body(msg)
+    body, quoted = split_reply(full_body)
+    thread_id = extract_thread_id(msg)
+    staging = os.path.join(staging_dir, f"{uid}-{os.getpid()}")
+    parsed.update(
+        thread_id=thread_id,
+        body=body,
+        original=zlib.compress(full_body.encode()) if quoted else None,
+        staging=staging,
+        attachments=extract_attachments(msg, thread_id, save_dir=staging),
     )
-    msg_id = cursor.lastrowid
-    atlas_db.commit()
-    atlas_db.close()
-    # Touch .wake so main session picks up the message even if trigger.sh fails
-    Path(WAKE_PATH).touch()
-    return msg_id
+    return parsed
+
+
+def adopt_attachments(staged, thread_id):
+    """Move staged attachments into the thread's directory without overwriting existing files."""
+    save_dir = os.path.join(ATTACHMENTS_DIR, thread_id)
+    attachments = []
+    for a in staged:
+        os.makedirs(save_dir, exist_ok=True)
+        base, ext = os.path.splitext(a["filename"])
+        filepath = os.path.join(save_dir, a["filename"])
+        counter = 1
+        while os.path.exists(filepath):
+            filepath = os.path.join(save_dir, f"{base}-{counter}{ext}")
+            counter += 1
+        os.replace(a["path"], filepath)
+        attachments.append({**a, "path": filepath})
+    return attachments
+
+
+def discard_staging(parsed):
+    if parsed.get("staging"):
+        shutil.rmtree(parsed["staging"], ignore_errors=True)
+
+
+def parse_chunk(mail, chunk, whitelist, pool=None, extra_headers=()):
+    """Fetch one chunk of UIDs and start parsing it in the pool, when given.
+
+    Returns (uid, future) pairs with a pool, (uid, raw) pairs without — those
+    are parsed by the caller, so one unreadable message fails on its own.
+    """
+    fetched = fetch_messages(mail, chunk)
+    if pool is None:
+        return list(fetched)
+    return [(uid, pool.submit(parse_message, uid, raw, whitelist, extra_headers)) for uid, raw in fetched]
+
+
+class EmailAdapter(channel_core.ChannelAdapter):
+    """Stores parsed emails for the shared ingestion core (one folder's sync config)."""
+
+    channel = "email"
+    trigger_name = TRIGGER_NAME
+    record_table = "emails"
+
+    def __init__(self, config, executor=None):
+        self.config = config  # per-folder sync config (folder and UIDVALIDITY, see cmd_poll)
+        self.priority = config["priority_rules"]
+        self.rate_limit = config["thread_rate_limit"]
+        self.lanes = executor  # triggers of different threads fire concurrently (see cmd_poll)
+
+    def connect(self):
+        return get_email_db(self.config)
+
+    def classify(self, parsed):
+        """Priority rules first (high wins); automated mail then takes the `automated` route."""
+        priority = super().classify(parsed)
+        if priority == "high" or not parsed.get("automated"):
+            return priority
+        return {"digest": "low", "store": "silent"}.get(self.config["automated"], priority)
+
+    def store(self, db, parsed):
+        headers = parsed["headers"]
+        sender = parsed["sender"]
+        subject = headers.get("Subject", "(no subject)")
+        message_id_hdr = headers.get("Message-ID", "").strip()
+        thread_id = parsed["thread_id"]
+        body = parsed["body"]
+        quoted = parsed["original"] is not None
+
+        # 1. Update thread state in email DB
+        update_thread(db, thread_id, headers)
+
+        # 1b. Move decoded attachments into place
+        attachments = adopt_attachments(parsed["attachments"], thread_id)
+        discard_staging(parsed)
+
+        # 2. Store email in email DB (new content; the full original compressed alongside),
+        # advancing the thread's context snapshot in the same transaction
+        _, sender_addr = emaillib.utils.parseaddr(sender)
+        context = push_thread_context(db, thread_id, compact_entry("in", sender_addr, body))
+        cursor = db.execute("""
+            INSERT INTO emails (thread_id, message_id, direction, sender, subject, body, body_original)
+            VALUES (?, ?, 'in', ?, ?, ?, ?)
+        """, (thread_id, message_id_hdr, sender_addr, subject, body, parsed["original"]))
+        email_id = cursor.lastrowid
+
+        # 3. Inbox row + trigger payload, journaled by the core together with the UID.
+        # Both carry a preview and the email id; emails.body is the only full copy.
+        preview, truncated = body_preview(body)
+        inbox_content = f"From: {sender}\nSubject: {subject}\n"
+        if parsed.get("automated"):
+            inbox_content += f"Automated: {parsed['automated']}\n"
+        inbox_content += f"\n{preview}"
+        if truncated:
+            inbox_content += f"\n\n[Preview of {len(body)} characters — full text: email show {email_id}]"
+        if quoted:
+            inbox_content += f"\n\n[Quoted history omitted — full text: email show {email_id} --original]"
+        if attachments:
+            att_summary = "\n".join(f"  - {a['filename']} ({a['content_type']}, {a['size']} bytes): {a['path']}" for a in attachments)
+            inbox_content += f"\n\nAttachments:\n{att_summary}"
+
+        payload_data = {
+            "sender": sender,
+            "subject": subject,
+            "body": preview,
+            "thread_id": thread_id,
+            "message_id": message_id_hdr,
+            "date": headers.get("Date", ""),
+            "email_id": email_id,
+        }
+        if truncated:
+            payload_data["body_truncated"] = True
+        if quoted:
+            payload_data["quoted_omitted"] = True
+        if parsed.get("automated"):
+            payload_data["automated"] = parsed["automated"]
+        if context:
+            payload_data["context"] = context
+        if attachments:
+            payload_data["attachments"] = [
+                {"filename": a["filename"], "content_type": a["content_type"],
+                 "size": a["size"], "path": a["path"]} for a in attachments
+            ]
+
+        sent = sent_date(headers)
+        return {"id": email_id, "session_key": thread_id, "contact": sender_addr,
+                "sent_at": sent.timestamp() if sent else None,
+                "inbox_content": inbox_content, "payload": payload_data}
+
+    def checkpoint(self, db, parsed):
+        if self.config["folder"]:  # pushed mail (receive) has no IMAP position
+            set_last_uid(db, self.config["folder"], parsed["uid"])
+
+    def discard(self, parsed):
+        discard_staging(parsed)
+
+    def fire(self, payload, session_key):
+        return fire_trigger(payload, session_key)
+
+
+def fire_trigger(payload, thread_id):
+    """Fire the email trigger non-blocking (each thread gets its own trigger session)."""
+    return channel_core.fire_trigger(TRIGGER_NAME, payload, thread_id)
+
+
+def ingest_message(db, adapter, parsed, notify=True):
+    """Store one parsed email and checkpoint it with its UID.
+
+    Returns the email id (journaled for inbox + trigger delivery, see
+    channel_core.deliver), or None if the email was blocked or a duplicate.
+    """
+    uid = parsed["uid"]
+    headers = parsed["headers"]
+    sender = headers.get("From", "unknown")
+    subject = headers.get("Subject", "(no subject)")
+    message_id_hdr = headers.get("Message-ID", "").strip()
+
+    if parsed["blocked"]:
+        print(f"[{datetime.now()}] Blocked email from {sender}")
+        adapter.checkpoint(db, parsed)
+        db.commit()
+        return None
+
+    # Duplicates: listener reconnects, unpersisted last_uid, server resends, mailbox rebuilds
+    config = adapter.config
+    dedupe_keys = [f"uid:{config['folder']}:{config['uidvalidity']}:{uid}"] if config["folder"] else []
+    if message_id_hdr:
+        dedupe_keys.append(f"mid:{message_id_hdr}")
+    message = {**parsed, "sender": sender, "dedupe_keys": dedupe_keys, "summary": subject}
+
+    email_id = channel_core.ingest(db, adapter, message, notify=notify)
+    if email_id is not None and notify:
+        kind = f", automated: {parsed['automated']}" if parsed.get("automated") else ""
+        print(f"[{datetime.now()}] Email from {sender}: {subject[:60]} (thread={parsed['thread_id']}{kind})")
+    return email_id
+
+
+# --- Catch-up digest ---
+
+def fire_catchup_digest(db, from_email_id):
+    """Fire one trigger summarising a backlog ingested silently in catch-up mode."""
+    count, threads = db.execute("""
+        SELECT COUNT(*), COUNT(DISTINCT thread_id) FROM emails
+        WHERE id > ? AND direction = 'in'
+    """, (from_email_id,)).fetchone()
+    if not count:
+        return
+
+    top_senders = db.execute("""
+        SELECT sender, COUNT(*) AS n FROM emails
+        WHERE id > ? AND direction = 'in'
+        GROUP BY sender ORDER BY n DESC LIMIT 10
+    """, (from_email_id,)).fetchall()
+    latest = db.execute("""
+        SELECT thread_id, sender, subject, inbox_msg_id FROM emails
+        WHERE id > ? AND direction = 'in'
+        ORDER BY id DESC LIMIT ?
+    """, (from_email_id, CATCHUP_DIGEST_ITEMS)).fetchall()
+
+    payload = json.dumps({
+        "digest": True,
+        "summary": f"Caught up on {count} email(s) in {threads} thread(s). They are stored "
+                   f"and in the inbox, but no per-email trigger was fired.",
+        "email_count": count,
+        "thread_count": threads,
+        "top_senders": [{"sender": s, "count": n} for s, n in top_senders],
+        "latest": [
+            {"thread_id": t, "sender": s, "subject": subj, "inbox_message_id": i}
+            for t, s, subj, i in latest
+        ],
+    })
+    fire_trigger(payload, CATCHUP_SESSION_KEY)
+
+
+def catchup_drained(db):
+    """True when catch-up is active and every folder has ingested up to its backlog end."""
+    if not channel_core.get_state(db, "catchup_from_email_id"):
+        return False
+    return db.execute("SELECT 1 FROM folder_state WHERE catchup_until > last_uid").fetchone() is None
+
+
+def finish_catchup(db):
+    """Fire the digest and leave catch-up mode once the backlog is drained."""
+    fire_catchup_digest(db, int(channel_core.get_state(db, "catchup_from_email_id", "0")))
+    db.execute("DELETE FROM state WHERE key = 'catchup_from_email_id'")
+    db.execute("UPDATE folder_state SET catchup_until = 0")
+    db.commit()
+    print(f"[{datetime.now()}] Catch-up complete, digest trigger fired")
 
 
 # --- POLL command ---
 
-def cmd_poll(config, once=False):
-    """Fetch new emails from IMAP, store in DB, write to inbox, fire triggers."""
+def find_new_uids(db, mail, folder, condstore):
+    """Return (new UIDs, STATUS values) for one folder, or ([], status) if it is unchanged.
+
+    Unchanged folders cost a single STATUS command. A changed UIDVALIDITY means
+    the server rebuilt the mailbox and every stored UID is meaningless: the
+    folder is re-read from the date of its last sync, and Message-ID dedupe
+    keeps already-ingested mail from being stored twice.
+    """
+    state = get_folder_state(db, folder)
+    status = mailbox_status(mail, folder, condstore)
+
+    if state["uidvalidity"] and status["uidvalidity"] != state["uidvalidity"]:
+        since = (state["synced_at"] or datetime.now().strftime("%Y-%m-%d %H:%M:%S"))[:10]
+        since = (datetime.strptime(since, "%Y-%m-%d") - timedelta(days=1)).strftime("%d-%b-%Y")
+        print(f"[{datetime.now()}] UIDVALIDITY of {folder} changed "
+              f"({state['uidvalidity']} -> {status['uidvalidity']}), resyncing since {since}")
+        update_folder_state(db, folder, uidvalidity=status["uidvalidity"], uidnext=0,
+                            highestmodseq=0, last_uid=0, catchup_until=0, resync_since=since)
+        db.commit()
+        state = get_folder_state(db, folder)
+
+    if state["uidvalidity"] == status["uidvalidity"] and state["uidnext"] == status["uidnext"]:
+        # Nothing new; with CONDSTORE a changed HIGHESTMODSEQ here means flag changes only
+        if status["highestmodseq"] != state["highestmodseq"]:
+            update_folder_state(db, folder, highestmodseq=status["highestmodseq"])
+            db.commit()
+        return [], status
+
+    mail.select(folder)
+    last_uid = state["last_uid"]
+    if state["resync_since"]:
+        status_, data = mail.uid("search", None, f"UID {last_uid + 1}:* SINCE {state['resync_since']}")
+    elif last_uid > 0 or state["uidvalidity"]:
+        status_, data = mail.uid("search", None, f"UID {last_uid + 1}:*")
+    else:
+        status_, data = mail.uid("search", None, "UNSEEN")
+
+    if status_ != "OK":
+        return [], None
+    return sorted(u for u in map(int, (data[0] or b"").split()) if u > last_uid), status
+
+
+def sync_folder(db, mail, config, uids, pool, catchup=False, executor=None):
+    """Ingest new UIDs of the currently selected folder in fetch_chunk-sized chunks.
+
+    `config` carries the folder and its UIDVALIDITY. Backlogs above
+    catchup_threshold (or catchup=True) are ingested without per-email triggers.
+    """
+    folder = config["folder"]
+    catchup_until = get_folder_state(db, folder)["catchup_until"]
+    if not catchup_until and (catchup or len(uids) > config["catchup_threshold"]):
+        catchup_until = uids[-1]
+        if not channel_core.get_state(db, "catchup_from_email_id"):
+            from_email_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM emails").fetchone()[0]
+            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('catchup_from_email_id', ?)",
+                       (str(from_email_id),))
+        update_folder_state(db, folder, catchup_until=catchup_until)
+        db.commit()
+        print(f"[{datetime.now()}] Catch-up mode: ingesting {len(uids)} email(s) from {folder} "
+              f"without per-email triggers")
+
+    adapter = EmailAdapter(config, executor)
+    chunk_size = config["fetch_chunk"]
+    chunks = [uids[i:i + chunk_size] for i in range(0, len(uids), chunk_size)]
+    extra_headers = config["priority_rules"].header_names
+    pending = parse_chunk(mail, chunks[0], config["whitelist"], pool, extra_headers)
+    done = 0
+    for n, chunk in enumerate(chunks):
+        results = pending
+        # Fetch the next chunk while the workers parse this one
+        pending = (parse_chunk(mail, chunks[n + 1], config["whitelist"], pool, extra_headers)
+                   if n + 1 < len(chunks) else [])
+        stored = []
+        email_ids = []
+
+        # Single writer: apply results in UID order
+        for uid, result in results:
+            try:
+                parsed = (result.result() if pool
+                          else parse_message(uid, result, config["whitelist"], extra_headers))
+            except BrokenProcessPool:
+                raise  # a dead worker fails every pending message, not just this one
+            except Exception as e:
+                # Checkpoint past it: one unparseable message must not stall the folder
+                print(f"[{datetime.now()}] Skipping unreadable email UID {uid} in {folder}: {e}",
+                      file=sys.stderr)
+                set_last_uid(db, folder, uid)
+                db.commit()
+                continue
+            email_id = ingest_message(db, adapter, parsed, notify=uid > catchup_until)
+            if email_id is None:
+                continue
+            stored.append(uid)
+            email_ids.append(email_id)
+
+        # 4. Write the chunk to the Atlas inbox and fire triggers (checkpointed per stage)
+        channel_core.deliver(db, adapter, email_ids)
+
+        if config["mark_read"] and stored:
+            mail.uid("store", ",".join(map(str, stored)), "+FLAGS", "\\Seen")
+
+        done += len(chunk)
+        if catchup_until:
+            print(f"[{datetime.now()}] Catch-up progress: {done}/{len(uids)} email(s)")
+
+
+def cmd_poll(config, once=False, catchup=False):
+    """Fetch new emails from IMAP, store in DB, write to inbox, fire triggers.
+
+    Each configured folder is checked with one STATUS command and only selected
+    and searched when its UIDVALIDITY, UIDNEXT or HIGHESTMODSEQ moved. Backlogs
+    above catchup_threshold (or any run with catchup=True) are streamed in
+    fetch_chunk-sized chunks with progress output and ingested silently; a
+    single digest trigger summarises them at the end.
+    """
     if not config["imap_host"] or not config["username"] or not config["password"]:
         print(f"[{datetime.now()}] ERROR: Email not configured (IMAP). Set email section in config.yml")
         return
 
     db = get_email_db(config)
-
-    # Get last UID
-    row = db.execute("SELECT value FROM state WHERE key='last_uid'").fetchone()
-    last_uid = int(row[0]) if row and row[0].isdigit() else 0
+    # Worker lanes keyed by thread: storing stays in UID order, triggers of different threads
+    # fire concurrently (one slow trigger doesn't hold up the rest of the chunk)
+    executor = lanes.KeyedExecutor(config["lanes"], "email-poll") if config["lanes"] > 1 else None
 
     try:
+        adapter = EmailAdapter({**config, "uidvalidity": 0}, executor)
+        channel_core.resume_journal(db, adapter)
+        channel_core.flush_deferred(db, adapter)
+
+        # A previous run drained the backlog but died before sending the digest
+        if catchup_drained(db):
+            finish_catchup(db)
+
         mail = imaplib.IMAP4_SSL(config["imap_host"], config["imap_port"])
         mail.login(config["username"], config["password"])
-        mail.select(config["folder"])
+        condstore = "CONDSTORE" in mail.capabilities
 
-        # Search for new emails
-        if last_uid > 0:
-            status, data = mail.uid("search", None, f"UID {last_uid + 1}:*")
-        else:
-            status, data = mail.uid("search", None, "UNSEEN")
+        pool = None
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)  # left over from an interrupted run
+        try:
+            for folder in config["folders"]:
+                try:
+                    uids, status = find_new_uids(db, mail, folder, condstore)
+                except imaplib.IMAP4.error as e:
+                    print(f"[{datetime.now()}] IMAP error on {folder}: {e}")
+                    continue
+                if status is None:
+                    continue
+                if uids:
+                    print(f"[{datetime.now()}] Found {len(uids)} new email(s) in {folder}")
+                    # Bursts are parsed in a process pool; a handful of emails isn't worth the startup
+                    if pool is None and len(uids) >= PARALLEL_PARSE_MIN and config["parse_workers"] > 1:
+                        pool = ProcessPoolExecutor(max_workers=min(config["parse_workers"], len(uids)))
+                    sync_config = {**config, "folder": folder, "uidvalidity": status["uidvalidity"]}
+                    sync_folder(db, mail, sync_config, uids, pool, catchup=catchup, executor=executor)
+
+                # Folder fully synced: remember where the server stood. Everything below
+                # UIDNEXT has been looked at, so later searches start there even if
+                # the first (UNSEEN) sync skipped read mail.
+                last_uid = max(get_folder_state(db, folder)["last_uid"], status["uidnext"] - 1)
+                update_folder_state(db, folder, uidvalidity=status["uidvalidity"],
+                                    uidnext=status["uidnext"], highestmodseq=status["highestmodseq"],
+                                    last_uid=last_uid, resync_since="",
+                                    synced_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                db.commit()
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
 
-        if status != "OK" or not data[0]:
-            mail.logout()
-            db.close()
-            return
+        mail.logout()
 
-        uids = data[0].split()
-        print(f"[{datetime.now()}] Found {len(uids)} new email(s)")
+        if catchup_drained(db):
+            finish_catchup(db)
+        channel_core.flush_deferred(db, adapter)
+        partitions.maybe_archive(db, "emails", config["hot_months"])
 
-        max_uid = last_uid
-        trigger_queue = []  # Collect triggers to fire after all emails are stored
+    except imaplib.IMAP4.error as e:
+        print(f"[{datetime.now()}] IMAP error: {e}")
+    except Exception as e:
+        print(f"[{datetime.now()}] Error: {e}")
+    finally:
+        if executor:
+            executor.shutdown()
+            executor.export()
+        db.close()
 
-        for uid_bytes in uids:
-            uid = uid_bytes.decode()
-            uid_int = int(uid)
 
-            if uid_int <= last_uid:
-                continue
+# --- RECEIVE command (LMTP / SMTP push delivery) ---
+#
+# A minimal RFC 2033 (LMTP) / RFC 5321 (SMTP) server for mail relayed on the
+# host: an MTA hands each message over as it arrives and it takes the same
+# path as a polled one (parse_message → ingest_message → channel_core.deliver),
+# without IMAP round trips. No AUTH or TLS — bind it to localhost (the default).
+# The 250 reply is sent once the email is stored and journaled; inbox row and
+# trigger follow on the thread's worker lane.
 
-            status, msg_data = mail.uid("fetch", uid, "(RFC822)")
-            if status != "OK":
-                continue
+RECEIVE_STAGING_DIR = os.path.join(ATTACHMENTS_DIR, ".receive")  # not STAGING_DIR: poll clears that
 
-            raw = msg_data[0][1]
-            msg = emaillib.message_from_bytes(raw)
 
-            sender = msg.get("From", "unknown")
-            subject = msg.get("Subject", "(no subject)")
-            body = get_body(msg)
-            thread_id = extract_thread_id(msg)
-            message_id_hdr = msg.get("Message-ID", "").strip()
+def receive_config(config):
+    """Sync config for pushed mail: no folder, so no UID dedupe key or checkpoint."""
+    return {**config, "folder": "", "uidvalidity": 0}
 
-            if not is_whitelisted(sender, config["whitelist"]):
-                print(f"[{datetime.now()}] Blocked email from {sender}")
-                max_uid = max(max_uid, uid_int)
-                continue
 
-            # 1. Update thread state in email DB
-            thread_info = update_thread(db, thread_id, msg)
-
-            # 1b. Extract attachments
-            attachments = extract_attachments(msg, thread_id)
-
-            # 2. Store email in email DB
-            _, sender_addr = emaillib.utils.parseaddr(sender)
-            db.execute("""
-                INSERT INTO emails (thread_id, message_id, direction, sender, subject, body)
-                VALUES (?, ?, 'in', ?, ?, ?)
-            """, (thread_id, message_id_hdr, sender_addr, subject, body[:8000]))
-
-            # 2b. Save as searchable file
-            save_email_file(thread_id, sender, subject, msg.get("Date", ""), body, attachments)
-
-            # 3. Write to Atlas inbox
-            inbox_content = f"From: {sender}\nSubject: {subject}\n\n{body[:4000]}"
-            if attachments:
-                att_summary = "\n".join(f"  - {a['filename']} ({a['content_type']}, {a['size']} bytes): {a['path']}" for a in attachments)
-                inbox_content += f"\n\nAttachments:\n{att_summary}"
-            inbox_msg_id = write_to_atlas_inbox(sender, inbox_content, thread_id)
-
-            # Update email record with inbox msg id
-            db.execute("UPDATE emails SET inbox_msg_id = ? WHERE rowid = last_insert_rowid()", (inbox_msg_id,))
-
-            print(f"[{datetime.now()}] Email from {sender}: {subject[:60]} "
-                  f"(thread={thread_id}, inbox={inbox_msg_id})")
-
-            # 4. Queue trigger (fire after all emails stored)
-            payload_data = {
-                "inbox_message_id": inbox_msg_id,
-                "sender": sender,
-                "subject": subject,
-                "body": body[:4000],
-                "thread_id": thread_id,
-                "message_id": message_id_hdr,
-                "date": msg.get("Date", ""),
-            }
-            if attachments:
-                payload_data["attachments"] = [
-                    {"filename": a["filename"], "content_type": a["content_type"],
-                     "size": a["size"], "path": a["path"]} for a in attachments
-                ]
-            payload = json.dumps(payload_data)
-            trigger_queue.append((payload, thread_id))
-
-            if config["mark_read"]:
-                mail.uid("store", uid, "+FLAGS", "\\Seen")
-
-            max_uid = max(max_uid, uid_int)
-
-        # Persist UID state
-        if max_uid > last_uid:
-            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_uid', ?)", (str(max_uid),))
+def store_pushed(config, parsed):
+    """Worker-lane job: store one parsed pushed email. Returns its email id (None: blocked / duplicate)."""
+    db = get_email_db(config)
+    try:
+        return ingest_message(db, EmailAdapter(receive_config(config)), parsed)
+    finally:
+        db.close()
+
 
-        db.commit()
-        mail.logout()
+def deliver_pushed(config, email_id):
+    """Worker-lane job: inbox row + trigger for a stored pushed email."""
+    db = get_email_db(config)
+    try:
+        channel_core.deliver(db, EmailAdapter(receive_config(config)), [email_id])
+    except Exception as e:
+        print(f"[{datetime.now()}] ERROR delivering email {email_id} (resumed on restart): {e}",
+              file=sys.stderr)
+    finally:
+        db.close()
+
+
+class ReceiveSession:
+    """One LMTP/SMTP client connection."""
 
-        # Fire triggers non-blocking (each thread gets its own trigger session)
-        for payload, thread_id in trigger_queue:
+    def __init__(self, receiver, reader, writer):
+        self.receiver = receiver
+        self.reader = reader
+        self.writer = writer
+        self.greeted = False
+        self.reset()
+
+    def reset(self):
+        self.mail_from = None
+        self.recipients = []
+
+    async def reply(self, *lines):
+        self.writer.write("".join(f"{line}\r\n" for line in lines).encode())
+        await self.writer.drain()
+
+    async def run(self):
+        await self.reply(f"220 atlas {'LMTP' if self.receiver.lmtp else 'ESMTP'} ready")
+        while True:
             try:
-                subprocess.Popen(
-                    [TRIGGER_SCRIPT, TRIGGER_NAME, payload, thread_id],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                )
-                print(f"[{datetime.now()}] Trigger fired for thread {thread_id}")
-            except Exception as e:
-                print(f"[{datetime.now()}] Failed to fire trigger for {thread_id}: {e}")
+                line = await asyncio.wait_for(self.reader.readline(), RECEIVE_TIMEOUT)
+            except (asyncio.TimeoutError, ValueError):  # idle client / line over the stream limit
+                await self.reply("421 4.4.2 Timeout or line too long, closing connection")
+                return
+            if not line:
+                return
+            verb, _, arg = line.decode("latin-1").rstrip("\r\n").partition(" ")
+            handler = getattr(self, f"do_{verb.upper()}", None)
+            if handler is None:
+                await self.reply("502 5.5.2 Command not implemented")
+            elif await handler(arg.strip()) is False:
+                return
+
+    async def do_LHLO(self, arg):
+        if not self.receiver.lmtp:
+            return await self.reply("500 5.5.1 This is an SMTP server, use EHLO")
+        await self.hello()
+
+    async def do_EHLO(self, arg):
+        if self.receiver.lmtp:
+            return await self.reply("500 5.5.1 This is an LMTP server, use LHLO")
+        await self.hello()
+
+    async def do_HELO(self, arg):
+        if self.receiver.lmtp:
+            return await self.reply("500 5.5.1 This is an LMTP server, use LHLO")
+        self.greeted = True
+        self.reset()
+        await self.reply("250 atlas")
+
+    async def hello(self):
+        self.greeted = True
+        self.reset()
+        await self.reply("250-atlas", "250-PIPELINING", "250-8BITMIME", "250-ENHANCEDSTATUSCODES",
+                         f"250 SIZE {self.receiver.max_bytes}")
+
+    async def do_MAIL(self, arg):
+        if not self.greeted:
+            return await self.reply(f"503 5.5.1 Send {'LHLO' if self.receiver.lmtp else 'EHLO'} first")
+        match = re.match(r"FROM:\s*<([^>]*)>(.*)$", arg, re.IGNORECASE)
+        if not match:
+            return await self.reply("501 5.5.4 Syntax: MAIL FROM:<address>")
+        size = re.search(r"\bSIZE=(\d+)", match.group(2), re.IGNORECASE)
+        if size and int(size.group(1)) > self.receiver.max_bytes:
+            return await self.reply("552 5.3.4 Message size exceeds fixed limit")
+        self.reset()
+        self.mail_from = match.group(1)
+        await self.reply("250 2.1.0 OK")
+
+    async def do_RCPT(self, arg):
+        if self.mail_from is None:
+            return await self.reply("503 5.5.1 Need MAIL first")
+        match = re.match(r"TO:\s*<([^>]+)>", arg, re.IGNORECASE)
+        if not match:
+            return await self.reply("501 5.5.4 Syntax: RCPT TO:<address>")
+        if len(self.recipients) >= 100:
+            return await self.reply("452 4.5.3 Too many recipients")
+        self.recipients.append(match.group(1))
+        await self.reply("250 2.1.5 OK")
+
+    async def do_DATA(self, arg):
+        if not self.recipients:
+            return await self.reply("503 5.5.1 Need RCPT first")
+        await self.reply("354 End data with <CR><LF>.<CR><LF>")
+        lines, size = [], 0
+        line_start = True  # False while reading the rest of a line over the stream limit
+        while True:
+            try:
+                line = await asyncio.wait_for(self.read_data_line(), RECEIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self.reply("421 4.4.2 Timeout, closing connection")
+                return False
+            if not line:
+                return False
+            if line_start:
+                if line in (b".\r\n", b".\n"):
+                    break
+                if line.startswith(b"."):
+                    line = line[1:]  # dot-unstuffing
+            line_start = line.endswith(b"\n")
+            size += len(line)
+            if size <= self.receiver.max_bytes:
+                lines.append(line)
+
+        if size > self.receiver.max_bytes:
+            code = "552 5.3.4 Message size exceeds fixed limit"
+        else:
+            code = await self.receiver.accept(b"".join(lines))
+        # LMTP answers once per recipient: it's the same mailbox, so the same answer
+        await self.reply(*([code] * (len(self.recipients) if self.receiver.lmtp else 1)))
+        self.reset()
 
-    except imaplib.IMAP4.error as e:
-        print(f"[{datetime.now()}] IMAP error: {e}")
-    except Exception as e:
-        print(f"[{datetime.now()}] Error: {e}")
+    async def read_data_line(self):
+        """Next DATA line; a line over the stream limit comes back in pieces (no line ending)."""
+        try:
+            return await self.reader.readuntil(b"\n")
+        except asyncio.LimitOverrunError as e:
+            return await self.reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError as e:
+            return e.partial  # connection closed mid-line
+
+    async def do_RSET(self, arg):
+        self.reset()
+        await self.reply("250 2.0.0 OK")
+
+    async def do_NOOP(self, arg):
+        await self.reply("250 2.0.0 OK")
+
+    async def do_VRFY(self, arg):
+        await self.reply("252 2.5.2 Cannot VRFY user, but will accept message")
+
+    async def do_QUIT(self, arg):
+        await self.reply("221 2.0.0 Bye")
+        return False
+
+
+class Receiver:
+    """State shared by the connections of `email receive`."""
+
+    def __init__(self, get_config, lmtp, executor):
+        self.get_config = get_config
+        self.lmtp = lmtp
+        self.executor = executor
+        self.max_bytes = max_message_bytes(get_config())
+        self.received = itertools.count(1)
+
+    async def accept(self, raw):
+        """Parse, store and queue delivery of one message. Returns the reply line."""
+        config = self.get_config()
+        try:
+            parsed = await asyncio.to_thread(
+                parse_message, next(self.received), raw, config["whitelist"],
+                config["priority_rules"].header_names, RECEIVE_STAGING_DIR)
+        except Exception as e:
+            print(f"[{datetime.now()}] Rejecting unparsable pushed email: {e}", file=sys.stderr)
+            return "554 5.6.0 Message could not be parsed"
+        # Store on the thread's lane, so a thread's emails keep their order
+        key = parsed.get("thread_id") or ""
+        try:
+            email_id = await asyncio.wrap_future(self.executor.submit(key, store_pushed, config, parsed))
+        except Exception as e:
+            discard_staging(parsed)
+            print(f"[{datetime.now()}] ERROR storing pushed email: {e}", file=sys.stderr)
+            return "451 4.3.0 Temporary failure storing the message, try again later"
+        if email_id is not None:
+            self.executor.submit(key, deliver_pushed, config, email_id)
+        return "250 2.0.0 Message accepted for delivery"
+
+
+def parse_listen(value):
+    host, _, port = str(value).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def cmd_receive(get_config, listen=None, lmtp=True):
+    """Serve LMTP (or SMTP) on a local port and ingest each pushed message immediately."""
+    config = get_config()
+    host, port = parse_listen(listen or config["receive_listen"])
+    executor = lanes.KeyedExecutor(config["lanes"], "email-receive")
+    receiver = Receiver(get_config, lmtp, executor)
+
+    def housekeeping():
+        cfg = get_config()
+        db = get_email_db(cfg)
+        try:
+            adapter = EmailAdapter(receive_config(cfg))
+            channel_core.flush_deferred(db, adapter)
+            partitions.maybe_archive(db, "emails", cfg["hot_months"])
+        finally:
+            db.close()
+        executor.export()
+
+    # Deliver what a previous run stored but never got to the inbox / trigger
+    shutil.rmtree(RECEIVE_STAGING_DIR, ignore_errors=True)
+    db = get_email_db(config)
+    try:
+        channel_core.resume_journal(db, EmailAdapter(receive_config(config)))
     finally:
         db.close()
 
+    async def client(reader, writer):
+        try:
+            await ReceiveSession(receiver, reader, writer).run()
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            # One broken session must not take the loop's attention: log it and drop the client
+            print(f"[{datetime.now()}] ERROR in receive session: {e}", file=sys.stderr)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(client, host, port)
+    if host not in ("127.0.0.1", "::1", "localhost"):
+        print(f"[{datetime.now()}] WARNING: receive listens on {host} without AUTH/TLS — "
+              f"restrict access to trusted relays", file=sys.stderr)
+    print(f"[{datetime.now()}] Email receiver listening ({'LMTP' if lmtp else 'SMTP'} on {host}:{port})")
+    async with server:
+        while True:
+            await asyncio.sleep(RECEIVE_FLUSH_INTERVAL)
+            try:
+                # Batched and digest triggers come due between messages, too
+                await asyncio.to_thread(housekeeping)
+            except Exception as e:
+                print(f"[{datetime.now()}] ERROR flushing deferred triggers: {e}", file=sys.stderr)
 
-# --- SEND command ---
 
-def build_message(body, attachments=None):
-    """Build a MIMEText or MIMEMultipart message depending on attachments."""
-    if not attachments:
-        return MIMEText(body)
+# --- SMTP session ---
 
-    msg = MIMEMultipart()
-    msg.attach(MIMEText(body))
+_smtp_idle = []  # logged-in SMTP connections kept between commands (KEEP_WARM only)
 
-    for filepath in attachments:
-        path = Path(filepath)
-        if not path.exists():
-            print(f"WARNING: Attachment not found: {filepath}", file=sys.stderr)
-            continue
-        part = MIMEBase("application", "octet-stream")
-        part.set_payload(path.read_bytes())
-        encoders.encode_base64(part)
-        part.add_header("Content-Disposition", f'attachment; filename="{path.name}"')
-        msg.attach(part)
 
-    return msg
+def smtp_connect(config):
+    """A new SMTP connection: STARTTLS and login done."""
+    server = smtplib.SMTP(config["smtp_host"], config["smtp_port"])
+    server.starttls()
+    server.login(config["username"], config["password"])
+    return server
 
 
-def cmd_send(config, to, subject, body, attachments=None):
-    """Send a new email (not a reply)."""
+@contextmanager
+def smtp_session(config):
+    """Yield a logged-in SMTP connection, reusing a warm one when available."""
+    server = None
+    while KEEP_WARM and server is None:
+        try:
+            candidate = _smtp_idle.pop()
+        except IndexError:
+            break
+        try:
+            if candidate.noop()[0] == 250:
+                server = candidate
+        except (smtplib.SMTPException, OSError):
+            pass
+        if server is None:
+            candidate.close()
+
+    if server is None:
+        server = smtp_connect(config)
+
+    try:
+        yield server
+    except Exception:
+        server.close()
+        raise
+
+    if KEEP_WARM:
+        _smtp_idle.append(server)
+    else:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+# --- SEND command ---
+
+# --- Outbound MIME ---
+#
+# Outgoing emails are written once, with CRLF line endings, to a spooled temp
+# file — attachments base64-encoded in chunks straight from disk — and that
+# file is streamed to the SMTP DATA command. Memory use stays flat regardless
+# of attachment size.
+
+SPOOL_MEMORY_BYTES = 1024 * 1024   # larger messages spill to a temp file
+ENCODE_CHUNK = 57 * 1024           # multiple of 57 raw bytes = whole 76-char base64 lines
+
+# Signatures for files whose extension doesn't tell (or that have none)
+MAGIC_TYPES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+]
+
+
+def guess_content_type(path):
+    """Content type from the file name, then from the first bytes; octet-stream if unknown."""
+    ctype, encoding = mimetypes.guess_type(path.name)
+    if ctype and not encoding:
+        return ctype
+    with open(path, "rb") as f:
+        head = f.read(16)
+    for magic, magic_type in MAGIC_TYPES:
+        if head.startswith(magic):
+            return magic_type
+    return "application/octet-stream"
+
+
+def encoded_size(raw_size):
+    """Bytes a base64 body of raw_size takes on the wire (76-char lines + CRLF)."""
+    return (raw_size + 56) // 57 * 78
+
+
+class AttachmentError(Exception):
+    pass
+
+
+class OutgoingMessage:
+    """An outbound email built lazily: headers in memory, attachments read from disk on send.
+
+    Supports msg["Header"] = value like email.message.Message. Attachments are
+    checked (existence, type, total size against max_message_mb) when the
+    object is created, before any SMTP connection is opened.
+    """
+
+    def __init__(self, body, attachments=None, max_bytes=None):
+        self.body = body
+        self.headers = {}
+        self.attachments = []
+        for filepath in attachments or []:
+            path = Path(filepath)
+            if not path.is_file():
+                print(f"WARNING: Attachment not found: {filepath}", file=sys.stderr)
+                continue
+            self.attachments.append((path, guess_content_type(path), path.stat().st_size))
+
+        if max_bytes:
+            size = len(body.encode()) + sum(encoded_size(size) for _, _, size in self.attachments)
+            if size > max_bytes:
+                raise AttachmentError(
+                    f"Message too large: {size / 1e6:.1f} MB encoded, limit "
+                    f"{max_bytes / 1e6:.0f} MB (email.max_message_mb)")
+
+    def __setitem__(self, name, value):
+        self.headers[name] = value
+
+    def __getitem__(self, name):
+        return self.headers.get(name)
+
+    def write(self, fp):
+        """Write the complete message (CRLF line endings) to a binary file object."""
+        policy = emaillib.policy.SMTP  # CRLF, RFC 2047/2231 encoding of non-ASCII headers
+        text = MIMEText(self.body, policy=policy)
+
+        if not self.attachments:
+            for name, value in self.headers.items():
+                text[name] = value
+            fp.write(text.as_bytes())
+            return
+
+        boundary = f"=_atlas_{os.urandom(12).hex()}"
+        headers = "".join(policy.fold(name, value) for name, value in self.headers.items())
+        fp.write(f'{headers}MIME-Version: 1.0\r\n'
+                 f'Content-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode())
+
+        # The CRLF before a boundary belongs to the delimiter, not to the part
+        delimiter = f"\r\n--{boundary}\r\n".encode()
+        fp.write(delimiter[2:])
+        del text["MIME-Version"]
+        fp.write(text.as_bytes())
+
+        for path, ctype, _ in self.attachments:
+            maintype, subtype = ctype.split("/", 1)
+            part = MIMEBase(maintype, subtype, policy=policy)
+            del part["MIME-Version"]
+            part["Content-Transfer-Encoding"] = "base64"
+            part.add_header("Content-Disposition", "attachment", filename=path.name)
+            fp.write(delimiter)
+            fp.write(part.as_bytes())
+            with open(path, "rb") as f:
+                while chunk := f.read(ENCODE_CHUNK):
+                    fp.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+
+        fp.write(f"\r\n--{boundary}--\r\n".encode())
+
+    def send(self, server):
+        """Stream the message to a connected SMTP server (MAIL FROM / RCPT TO / DATA)."""
+        from_addr = emaillib.utils.parseaddr(self.headers["From"])[1]
+        to_addrs = [addr for _, addr in emaillib.utils.getaddresses([self.headers["To"]])]
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as fp:
+            self.write(fp)
+            size = fp.tell()
+            fp.seek(0)
+
+            server.ehlo_or_helo_if_needed()
+            options = [f"SIZE={size}"] if server.has_extn("size") else []
+            try:
+                code, resp = server.mail(from_addr, options)
+                if code != 250:
+                    raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+                for addr in to_addrs:
+                    code, resp = server.rcpt(addr)
+                    if code not in (250, 251):
+                        raise smtplib.SMTPRecipientsRefused({addr: (code, resp)})
+                code, resp = server.docmd("data")
+                if code != 354:
+                    raise smtplib.SMTPDataError(code, resp)
+            except smtplib.SMTPException:
+                try:
+                    server.rset()
+                except smtplib.SMTPServerDisconnected:
+                    pass  # the server hung up: keep the refusal, not the failed reset
+                raise
+
+            # Dot-stuff line by line, sent in ~64 KB batches
+            batch = []
+            batched = 0
+            line = b""
+            for line in fp:
+                if line.startswith(b"."):
+                    line = b"." + line
+                batch.append(line)
+                batched += len(line)
+                if batched >= 65536:
+                    server.send(b"".join(batch))
+                    batch, batched = [], 0
+            batch.append(b".\r\n" if line.endswith(b"\r\n") else b"\r\n.\r\n")
+            server.send(b"".join(batch))
+
+            code, resp = server.getreply()
+            if code != 250:
+                raise smtplib.SMTPDataError(code, resp)
+
+
+def build_message(config, body, attachments=None):
+    """Build an outbound message; exits with an error if the attachments exceed the size limit."""
+    try:
+        return OutgoingMessage(body, attachments, max_bytes=max_message_bytes(config))
+    except AttachmentError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def require_smtp(config):
     if not config["smtp_host"] or not config["username"] or not config["password"]:
         print("ERROR: SMTP not configured. Set email section in config.yml", file=sys.stderr)
         sys.exit(1)
 
-    db = get_email_db(config)
 
-    msg = build_message(body, attachments)
+def new_message(config, to, subject, body, attachments=None, msg=None):
+    """Outbound message starting a new thread (headers set, not sent).
+
+    `msg` is an already built OutgoingMessage for `body`; built (exiting if too large) when omitted.
+    """
+    msg = msg or build_message(config, body, attachments)
     msg["From"] = config["username"]
     msg["To"] = to
     msg["Subject"] = subject
     msg["Date"] = formatdate(localtime=True)
     domain = config["username"].split("@")[-1] if "@" in config["username"] else "atlas.local"
     msg["Message-ID"] = make_msgid(domain=domain)
+    return msg
 
-    try:
-        with smtplib.SMTP(config["smtp_host"], config["smtp_port"]) as server:
-            server.starttls()
-            server.login(config["username"], config["password"])
-            server.send_message(msg)
 
-        # Create thread in DB
-        thread_id = sanitize_thread_id(msg["Message-ID"])
-        db.execute("""
-            INSERT OR IGNORE INTO threads
-            (thread_id, subject, last_message_id, references_chain,
-             last_sender, last_sender_full, participants, message_count)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 1)
-        """, (
-            thread_id, subject, msg["Message-ID"],
-            json.dumps([msg["Message-ID"]]),
-            config["username"], config["username"],
-            json.dumps(sorted([config["username"], to])),
-        ))
+def record_new_thread(db, config, msg, to, subject, body):
+    """Create the thread and email rows for a sent new-thread message (no commit). Returns the thread ID."""
+    thread_id = sanitize_thread_id(msg["Message-ID"])
+    db.execute("""
+        INSERT OR IGNORE INTO threads
+        (thread_id, subject, last_message_id, references_chain,
+         last_sender, last_sender_full, participants, message_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+    """, (
+        thread_id, subject, msg["Message-ID"],
+        json.dumps([msg["Message-ID"]]),
+        config["username"], config["username"],
+        json.dumps(sorted([config["username"], to])),
+    ))
 
-        # Store email record
-        db.execute("""
-            INSERT INTO emails (thread_id, message_id, direction, sender, recipient, subject, body)
-            VALUES (?, ?, 'out', ?, ?, ?, ?)
-        """, (thread_id, msg["Message-ID"], config["username"], to, subject, body[:8000]))
+    # Store email record
+    push_thread_context(db, thread_id, compact_entry("out", config["username"], body))
+    db.execute("""
+        INSERT INTO emails (thread_id, message_id, direction, sender, recipient, subject, body)
+        VALUES (?, ?, 'out', ?, ?, ?, ?)
+    """, (thread_id, msg["Message-ID"], config["username"], to, subject, body))
+    return thread_id
+
+
+def cmd_send(config, to, subject, body, attachments=None):
+    """Send a new email (not a reply)."""
+    require_smtp(config)
+
+    db = get_email_db(config)
 
+    msg = new_message(config, to, subject, body, attachments)
+
+    try:
+        with smtp_session(config) as server:
+            msg.send(server)
+
+        # Create thread in DB
+        thread_id = record_new_thread(db, config, msg, to, subject, body)
         db.commit()
         print(f"Email sent to {to} (subject=\"{subject}\", thread={thread_id})")
 
@@ -578,13 +1692,195 @@ def cmd_send(config, to, subject, body, attachments=None):
         db.close()
 
 
+# --- BULK-SEND command ---
+#
+# One template, many recipients: messages are rendered up front (so a bad
+# template or a missing field fails before anything is sent), then sent by a
+# few worker threads sharing a small pool of logged-in SMTP connections behind
+# one rate limit. Each result is appended to the NDJSON report as it happens;
+# the threads of all sent emails are recorded in one transaction at the end.
+
+def load_recipients(path):
+    """Recipient rows from a CSV file (header row) or NDJSON ({"email": ..., ...} per line)."""
+    fp = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        first = fp.readline()
+        if first.lstrip().startswith("{"):
+            lines = [first] + list(fp)
+            return [json.loads(line) for line in lines if line.strip()]
+        return list(csv.DictReader([first] + list(fp)))
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+
+
+def render_bulk(recipients, subject_template, body_template):
+    """[(row number, address, subject, body, error)] — $field placeholders filled per recipient."""
+    subject_t, body_t = Template(subject_template), Template(body_template)
+    seen = set()
+    rendered = []
+    for n, row in enumerate(recipients, 1):
+        fields = {str(k).strip(): "" if v is None else str(v) for k, v in row.items()}
+        to = fields.get("email", "").strip()
+        error = None
+        if "@" not in emaillib.utils.parseaddr(to)[1]:
+            error = "invalid or missing email address"
+        elif to.lower() in seen:
+            error = "duplicate recipient"
+        seen.add(to.lower())
+        subject = body = ""
+        if not error:
+            try:
+                subject, body = subject_t.substitute(fields), body_t.substitute(fields)
+            except (KeyError, ValueError) as e:
+                error = f"template field missing or invalid: {e}"
+        rendered.append((n, to, subject, body, error))
+    return rendered
+
+
+class SMTPPool:
+    """Up to `size` logged-in SMTP connections shared by worker threads."""
+
+    def __init__(self, config, size):
+        self.config = config
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.slots = threading.Semaphore(size)
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            try:
+                server = self.idle.get_nowait()
+            except queue.Empty:
+                server = smtp_connect(self.config)
+            try:
+                yield server
+            except (smtplib.SMTPServerDisconnected, OSError):
+                server.close()  # broken: the next user opens a fresh one
+                raise
+            except Exception:
+                self.idle.put(server)  # recipient refused etc. — the session is fine (RSET done)
+                raise
+            self.idle.put(server)
+
+    def close(self):
+        while not self.idle.empty():
+            server = self.idle.get_nowait()
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+
+class Throttle:
+    """Spaces calls to wait() at least 1/rate seconds apart across threads (rate 0 = unthrottled)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+
+def cmd_bulk_send(config, recipients_path, subject, body, attachments=None, connections=None,
+                  rate=None, report=None, dry_run=False):
+    """Mail-merge: send one templated new-thread email per recipient and write a result report."""
+    require_smtp(config)
+    try:
+        rendered = render_bulk(load_recipients(recipients_path), subject, body)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"ERROR: Cannot read recipients: {e}", file=sys.stderr)
+        sys.exit(1)
+    valid = [r for r in rendered if r[4] is None]
+    print(f"{len(rendered)} recipient(s), {len(valid)} ready, {len(rendered) - len(valid)} skipped")
+
+    if dry_run:
+        for n, to, subj, text, error in rendered:
+            print(f"  #{n} {to or '-'}: {f'SKIP ({error})' if error else subj}")
+        if valid:
+            print(f"\n--- Preview (#{valid[0][0]}) ---\nTo: {valid[0][1]}\nSubject: {valid[0][2]}\n\n{valid[0][3]}")
+        return
+
+    # Attachments and the size limit are checked once, before any connection is opened;
+    # a recipient whose rendered body pushes the message over the limit fails on its own
+    build_message(config, "", attachments)
+    max_bytes = max_message_bytes(config)
+
+    report = report or os.path.join(BULK_REPORTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.ndjson")
+    os.makedirs(os.path.dirname(os.path.abspath(report)), exist_ok=True)
+    pool = SMTPPool(config, connections or config["bulk_connections"])
+    throttle = Throttle(config["bulk_rate"] if rate is None else rate)
+
+    def send_one(item):
+        n, to, subj, text, _ = item
+        msg = new_message(config, to, subj, text, attachments,
+                          msg=OutgoingMessage(text, attachments, max_bytes=max_bytes))
+        for attempt in (1, 2):
+            throttle.wait()
+            try:
+                with pool.connection() as server:
+                    msg.send(server)
+                return msg
+            except (smtplib.SMTPServerDisconnected, OSError):
+                if attempt == 2:
+                    raise  # second broken connection in a row: give up on this recipient
+
+    sent = []
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    started = time.monotonic()
+    try:
+        with open(report, "w", encoding="utf-8") as out:
+            def log(n, to, status, **extra):
+                counts[status] += 1
+                out.write(json.dumps({"row": n, "email": to, "status": status, **extra}) + "\n")
+                out.flush()
+
+            for n, to, _, _, error in rendered:
+                if error:
+                    log(n, to, "skipped", error=error)
+
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = {executor.submit(send_one, item): item for item in valid}
+                for future in as_completed(futures):
+                    n, to, subj, text, _ = futures[future]
+                    try:
+                        msg = future.result()
+                    except Exception as e:
+                        log(n, to, "failed", error=str(e))
+                        print(f"[{datetime.now()}] Bulk #{n} to {to} failed: {e}", file=sys.stderr)
+                        continue
+                    sent.append((msg, to, subj, text))
+                    log(n, to, "sent", message_id=msg["Message-ID"],
+                        thread_id=sanitize_thread_id(msg["Message-ID"]))
+    finally:
+        pool.close()
+        # All threads in one transaction — also for the mails out before an interrupted run
+        db = get_email_db(config)
+        try:
+            for msg, to, subj, text in sent:
+                record_new_thread(db, config, msg, to, subj, text)
+            db.commit()
+        finally:
+            db.close()
+
+    print(f"Bulk send done in {time.monotonic() - started:.1f}s: {counts['sent']} sent, "
+          f"{counts['failed']} failed, {counts['skipped']} skipped. Report: {report}")
+    if counts["failed"]:
+        sys.exit(1)
+
+
 # --- REPLY command ---
 
 def cmd_reply(config, thread_id, body, attachments=None):
     """Reply to an existing email thread with proper threading headers."""
-    if not config["smtp_host"] or not config["username"] or not config["password"]:
-        print("ERROR: SMTP not configured. Set email section in config.yml", file=sys.stderr)
-        sys.exit(1)
+    require_smtp(config)
 
     db = get_email_db(config)
 
@@ -603,7 +1899,7 @@ def cmd_reply(config, thread_id, body, attachments=None):
     last_message_id = thread_data["last_message_id"]
     references = json.loads(thread_data["references_chain"])
 
-    msg = build_message(body, attachments)
+    msg = build_message(config, body, attachments)
     msg["From"] = config["username"]
     msg["To"] = recipient
     msg["Subject"] = f"Re: {subject}"
@@ -617,10 +1913,8 @@ def cmd_reply(config, thread_id, body, attachments=None):
         msg["References"] = " ".join(references)
 
     try:
-        with smtplib.SMTP(config["smtp_host"], config["smtp_port"]) as server:
-            server.starttls()
-            server.login(config["username"], config["password"])
-            server.send_message(msg)
+        with smtp_session(config) as server:
+            msg.send(server)
 
         # Update thread state: append our Message-ID to references
         references.append(msg["Message-ID"])
@@ -634,11 +1928,13 @@ def cmd_reply(config, thread_id, body, attachments=None):
         """, (msg["Message-ID"], json.dumps(references), datetime.now().isoformat(), thread_id))
 
         # Store email record
-        db.execute("""
+        push_thread_context(db, thread_id, compact_entry("out", config["username"], body))
+        cursor = db.execute("""
             INSERT INTO emails (thread_id, message_id, direction, sender, recipient, subject, body)
             VALUES (?, ?, 'out', ?, ?, ?, ?)
         """, (thread_id, msg["Message-ID"], config["username"], recipient,
-              f"Re: {subject}", body[:8000]))
+              f"Re: {subject}", body))
+        channel_core.record_reply(db, thread_id, cursor.lastrowid)
 
         db.commit()
         print(f"Reply sent to {recipient} (thread={thread_id}, "
@@ -698,26 +1994,273 @@ def cmd_thread_detail(config, thread_id):
 
     print(json.dumps(data, indent=2))
 
-    # Show emails in thread
-    emails = db.execute("""
-        SELECT direction, sender, subject, created_at, body
-        FROM emails WHERE thread_id = ? ORDER BY created_at
-    """, (thread_id,)).fetchall()
+    # Show emails in thread (older months from the partitions the thread spans)
+    emails = list(reversed(partitions.scan(
+        db, "emails", ("direction", "sender", "subject", "created_at", "body", "id", "body_original"),
+        "thread_id = ?", (thread_id,), since=data["created_at"],
+    )))
 
     if emails:
         print(f"\n--- Messages ({len(emails)}) ---")
         for e in emails:
             direction = "→" if e[0] == "out" else "←"
-            print(f"\n{direction} {e[1]} ({e[3]})")
+            print(f"\n{direction} {e[1]} ({e[3]}) [email {e[5]}{', quoted history omitted' if e[6] is not None else ''}]")
             print(f"  Subject: {e[2]}")
             print(f"  {e[4][:200]}{'...' if len(e[4] or '') > 200 else ''}")
 
     db.close()
 
 
+# --- SHOW command ---
+
+def cmd_show(config, email_id, original=False):
+    """Print one stored email; --original restores the quoted history and signature."""
+    db = get_email_db(config)
+    rows = partitions.scan(
+        db, "emails", ("thread_id", "direction", "sender", "recipient", "subject", "created_at", "body",
+                       "body_original", "id"),
+        "id = ?", (email_id,), record_id=email_id, limit=1,
+    )
+    db.close()
+    if not rows:
+        print(f"Email {email_id} not found.", file=sys.stderr)
+        sys.exit(1)
+
+    thread_id, direction, sender, recipient, subject, created_at, body, body_original, _ = rows[0]
+    if original and body_original is not None:
+        body = zlib.decompress(body_original).decode()
+
+    print(f"Thread: {thread_id}")
+    print(f"From: {sender}" if direction == "in" else f"To: {recipient}")
+    print(f"Date: {created_at}")
+    print(f"Subject: {subject}\n")
+    print(body)
+    if not original and body_original is not None:
+        print(f"\n[Quoted history omitted — email show {email_id} --original]")
+
+
+# --- EXPORT / IMPORT / BACKUP commands ---
+
+# Persistent tables in restore order; ingest_journal is host-local and not exported
+TRANSFER_TABLES = ("threads", "emails", "thread_context", "dedupe", "folder_state", "state")
+
+
+def cmd_export(config, output="-"):
+    """Stream the account DB to NDJSON from one read snapshot (constant memory)."""
+    db = get_email_db(config)
+    out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    try:
+        counts = dbtransfer.export_ndjson(
+            db, "email", TRANSFER_TABLES, out,
+            partitions=[("emails", path) for _, path in partitions.partition_paths(db, "emails")])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+    summary = ", ".join(f"{t}={n}" for t, n in counts.items())
+    print(f"[{datetime.now()}] Exported {summary}", file=sys.stderr)
+
+
+def cmd_import(config, path):
+    """Load an NDJSON export into the account DB in batches (safe while polling)."""
+    db = get_email_db(config)
+    fp = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        counts = dbtransfer.import_ndjson(db, "email", TRANSFER_TABLES, fp)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+        db.close()
+    for table, (inserted, skipped) in counts.items():
+        print(f"{table}: {inserted} imported, {skipped} already present")
+
+
+def cmd_backup(config, dest):
+    """Copy the account DB with the SQLite online backup API while polling continues."""
+    db = get_email_db(config)
+    try:
+        size = dbtransfer.online_backup(db, dest)
+        parts = dbtransfer.backup_partitions([p for _, p in partitions.partition_paths(db, "emails")], dest)
+    finally:
+        db.close()
+    print(f"[{datetime.now()}] Backup written to {dest} ({size} bytes, {parts} partition file(s))")
+
+
+# --- IMPORT command (mbox / Maildir archives) ---
+
+ARCHIVE_BATCH = 1000  # archived emails parsed ahead / written per transaction
+ARCHIVE_STAGING_DIR = os.path.join(ATTACHMENTS_DIR, ".import")  # not STAGING_DIR: poll clears that
+
+
+def read_archive(path, kind):
+    """Yield the raw bytes of each message of an mbox file or Maildir, oldest first where known."""
+    if kind == "mbox":
+        box = mailbox.mbox(path, create=False)
+        keys = box.iterkeys()
+    else:
+        box = mailbox.Maildir(path, factory=None, create=False)
+        keys = sorted(box.keys())  # Maildir names start with the delivery time
+    try:
+        for key in keys:
+            yield box.get_bytes(key)
+    finally:
+        box.close()
+
+
+def store_archived(db, config, parsed):
+    """Write one archived email and its thread state without committing.
+
+    Dated by its Date header; no context snapshot, journal, inbox row or
+    trigger. Returns the thread id, or None for an email already stored
+    (same Message-ID dedupe key as `poll`, so archive and IMAP never double up).
+    """
+    headers = parsed["headers"]
+    message_id = headers.get("Message-ID", "").strip()
+    sender = headers.get("From", "unknown")
+    subject = headers.get("Subject", "(no subject)")
+    key = f"mid:{message_id}" if message_id else f"archive:{sender}|{headers.get('Date', '')}|{subject}"
+    if not channel_core.claim_dedupe_keys(db, [key]):
+        discard_staging(parsed)
+        return None
+
+    thread_id = parsed["thread_id"]
+    if not (message_id or headers.get("References") or headers.get("In-Reply-To")):
+        # extract_thread_id falls back to the current second — a whole batch would share it
+        thread_id = f"email-{zlib.crc32(key.encode()):08x}"
+    sent = sent_date(headers) or datetime.now(timezone.utc)
+    created_at = sent.strftime("%Y-%m-%d %H:%M:%S")  # UTC, like datetime('now')
+    updated_at = sent.astimezone().replace(tzinfo=None).isoformat()  # local, like update_thread
+
+    _, sender_addr = emaillib.utils.parseaddr(sender)
+    outgoing = sender_addr.lower() == config["username"].lower()
+    row = db.execute("SELECT participants FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+    participants = set(json.loads(row[0])) if row else set()
+    if sender_addr:
+        participants.add(sender_addr)
+
+    # Thread fields follow the newest email; live state written by poll is newer than any archive
+    db.execute("""
+        INSERT INTO threads (thread_id, subject, last_message_id, references_chain, last_sender,
+                             last_sender_full, participants, message_count, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT(thread_id) DO UPDATE SET
+            participants = excluded.participants,
+            message_count = message_count + 1,
+            created_at = min(created_at, excluded.created_at),
+            subject = iif(excluded.updated_at > updated_at, excluded.subject, subject),
+            last_message_id = iif(excluded.updated_at > updated_at, excluded.last_message_id, last_message_id),
+            references_chain = iif(excluded.updated_at > updated_at, excluded.references_chain, references_chain),
+            last_sender = iif(excluded.updated_at > updated_at, excluded.last_sender, last_sender),
+            last_sender_full = iif(excluded.updated_at > updated_at, excluded.last_sender_full, last_sender_full),
+            updated_at = max(updated_at, excluded.updated_at)
+    """, (thread_id, re.sub(r"^(Re:\s*)+", "", subject, flags=re.IGNORECASE).strip(), message_id,
+          json.dumps(build_references_chain(headers)), sender_addr, sender,
+          json.dumps(sorted(participants)), created_at, updated_at))
+
+    adopt_attachments(parsed["attachments"], thread_id)
+    discard_staging(parsed)
+    _, recipient = emaillib.utils.parseaddr(headers.get("To", "")) if outgoing else ("", "")
+    db.execute("""
+        INSERT INTO emails (thread_id, message_id, direction, sender, recipient, subject, body,
+                            body_original, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (thread_id, message_id, "out" if outgoing else "in", sender_addr, recipient, subject,
+          parsed["body"], parsed["original"], created_at))
+    return thread_id
+
+
+def cmd_import_archive(config, path, kind):
+    """Bulk-import an mbox file or Maildir as searchable history: no inbox rows, no triggers.
+
+    Messages are parsed in the parse_workers process pool one batch ahead of
+    the writer, which commits ARCHIVE_BATCH emails per transaction. Re-running
+    an interrupted import skips what is already stored.
+    """
+    try:
+        messages = read_archive(path, kind)
+        first = next(messages, None)
+    except (mailbox.NoSuchMailboxError, OSError) as e:
+        print(f"ERROR: cannot open {kind} {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    db = get_email_db(config)
+    shutil.rmtree(ARCHIVE_STAGING_DIR, ignore_errors=True)  # left over from an interrupted import
+    pool = ProcessPoolExecutor(max_workers=config["parse_workers"]) if config["parse_workers"] > 1 else None
+    stream = itertools.chain([first] if first is not None else [], messages)
+    read = imported = duplicates = failed = 0
+    threads = set()
+    started = time.monotonic()
+
+    def parse_next():
+        nonlocal read
+        batch = []
+        for raw in itertools.islice(stream, ARCHIVE_BATCH):
+            read += 1
+            args = (read, raw, (), ("To",), ARCHIVE_STAGING_DIR)
+            batch.append(pool.submit(parse_message, *args) if pool else args)
+        return batch
+
+    try:
+        pending = parse_next()
+        while pending:
+            results = pending
+            pending = parse_next()  # the workers parse the next batch while this one is written
+            for result in results:
+                try:
+                    parsed = result.result() if pool else parse_message(*result)
+                except Exception as e:
+                    failed += 1
+                    print(f"[{datetime.now()}] Skipping unreadable message: {e}", file=sys.stderr)
+                    continue
+                thread_id = store_archived(db, config, parsed)
+                if thread_id is None:
+                    duplicates += 1
+                else:
+                    imported += 1
+                    threads.add(thread_id)
+            db.commit()
+            elapsed = time.monotonic() - started
+            print(f"[{datetime.now()}] Import progress: {read} message(s), "
+                  f"{read / elapsed if elapsed else 0:.0f}/s", flush=True)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        shutil.rmtree(ARCHIVE_STAGING_DIR, ignore_errors=True)
+        if db.in_transaction:
+            db.commit()  # keep what was written before an interruption; a re-run skips it
+
+    elapsed = time.monotonic() - started
+    print(f"Imported {imported} email(s) in {len(threads)} thread(s) from {path} "
+          f"({duplicates} already present, {failed} unreadable) in {elapsed:.1f}s")
+    try:
+        if config["hot_months"] > 0:
+            partitions.archive(db, "emails", config["hot_months"])  # years of history don't stay hot
+    finally:
+        db.close()
+
+
+# --- PARTITIONS command ---
+
+def cmd_partitions(config, archive=False, hot_months=None):
+    """List the monthly partitions; with archive=True move old months out of the hot DB first."""
+    db = get_email_db(config)
+    try:
+        if archive:
+            months = hot_months or config["hot_months"] or 1
+            done = partitions.archive(db, "emails", months)
+            print(f"Archived {sum(n for _, n in done)} email(s) in {len(done)} month(s) "
+                  f"(keeping {months} month(s) hot)\n")
+        partitions.print_catalog(db, "emails")
+    finally:
+        db.close()
+
+
 # --- Main CLI ---
 
-def main():
+def main(argv=None, config=None):
     parser = argparse.ArgumentParser(
         description="Atlas Email Add-on — unified email management",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -725,17 +2268,35 @@ def main():
 Examples:
   email-addon.py poll --once          # Check IMAP once
   email-addon.py poll                 # Continuous polling
+  email-addon.py receive              # LMTP on 127.0.0.1:2424 for a local MTA (no polling)
   email-addon.py send alice@x.com "Subject" "Body text"
   email-addon.py reply <thread_id> "Reply body"
+  email-addon.py bulk-send people.csv --subject 'Hi $name' --body-file invite.txt --dry-run
   email-addon.py threads              # List all threads
   email-addon.py thread <thread_id>   # Thread detail
+  email-addon.py show 42 --original   # One email incl. quoted history
+  email-addon.py export --output mail.ndjson
+  email-addon.py backup /backups/mail.db
+  email-addon.py partitions --archive --hot-months 2
+  email-addon.py --profile poll --once
+  email-addon.py profile-summary --label poll
         """,
     )
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the command / each poll cycle (also: ATLAS_PROFILE=1)")
     sub = parser.add_subparsers(dest="command", required=True)
 
+    # receive
+    p_receive = sub.add_parser("receive", help="Accept pushed mail over LMTP/SMTP on a local port")
+    p_receive.add_argument("--listen", default=None, metavar="HOST:PORT",
+                           help="Address to listen on (default: email.receive_listen)")
+    p_receive.add_argument("--smtp", action="store_true", help="Speak SMTP instead of LMTP")
+
     # poll
     p_poll = sub.add_parser("poll", help="Fetch new emails from IMAP")
     p_poll.add_argument("--once", action="store_true", help="Check once and exit")
+    p_poll.add_argument("--catchup", action="store_true",
+                        help="Ingest the backlog silently and fire one digest trigger")
 
     # send
     p_send = sub.add_parser("send", help="Send a new email")
@@ -752,6 +2313,23 @@ Examples:
     p_reply.add_argument("--attach", action="append", default=[], metavar="FILE",
                         help="Attach a file (can be used multiple times)")
 
+    # bulk-send
+    p_bulk = sub.add_parser("bulk-send", help="Send one templated email to many recipients")
+    p_bulk.add_argument("recipients", help="CSV with a header row incl. 'email', NDJSON, or - for stdin")
+    p_bulk.add_argument("--subject", required=True, help="Subject template ($field / ${field})")
+    body_src = p_bulk.add_mutually_exclusive_group(required=True)
+    body_src.add_argument("--body", help="Body template ($field / ${field})")
+    body_src.add_argument("--body-file", metavar="FILE", help="Read the body template from a file")
+    p_bulk.add_argument("--attach", action="append", default=[], metavar="FILE",
+                        help="Attach a file to every email (can be used multiple times)")
+    p_bulk.add_argument("--connections", type=int, default=None,
+                        help="SMTP connections / parallel sends (default: email.bulk_connections)")
+    p_bulk.add_argument("--rate", type=float, default=None,
+                        help="Max emails per second, 0 = unthrottled (default: email.bulk_rate)")
+    p_bulk.add_argument("--report", default=None, metavar="FILE",
+                        help="Per-recipient NDJSON report (default: ~/.index/email/bulk/<time>.ndjson)")
+    p_bulk.add_argument("--dry-run", action="store_true", help="Render and validate only, send nothing")
+
     # threads
     p_threads = sub.add_parser("threads", help="List email threads")
     p_threads.add_argument("--limit", type=int, default=20, help="Max threads to show")
@@ -760,21 +2338,82 @@ Examples:
     p_thread = sub.add_parser("thread", help="Show thread detail")
     p_thread.add_argument("thread_id", help="Thread ID")
 
-    args = parser.parse_args()
-    config = load_config()
+    # show one email
+    p_show = sub.add_parser("show", help="Show one email")
+    p_show.add_argument("email_id", type=int, help="Email ID (see `thread`)")
+    p_show.add_argument("--original", action="store_true",
+                        help="Include the quoted history and signature stripped at ingest")
+
+    # export / import / backup
+    p_export = sub.add_parser("export", help="Stream the account DB as NDJSON")
+    p_export.add_argument("--output", default="-", metavar="FILE", help="Output file (default: stdout)")
+    p_import = sub.add_parser("import", help="Load an NDJSON export, or mail history from an archive")
+    source = p_import.add_mutually_exclusive_group(required=True)
+    source.add_argument("file", nargs="?", help="Export file, or - for stdin")
+    source.add_argument("--mbox", metavar="FILE",
+                        help="Import the emails of an mbox file (no inbox rows, no triggers)")
+    source.add_argument("--maildir", metavar="DIR",
+                        help="Import the emails of a Maildir (no inbox rows, no triggers)")
+    p_backup = sub.add_parser("backup", help="Online backup of the account DB")
+    p_backup.add_argument("dest", help="Destination database file")
+
+    # partitions
+    p_parts = sub.add_parser("partitions", help="List / archive monthly partitions")
+    p_parts.add_argument("--archive", action="store_true",
+                         help="Move months older than the hot window into partition files")
+    p_parts.add_argument("--hot-months", type=int, default=None, metavar="N",
+                         help="Months kept in the hot DB (default: email.hot_months, else 1)")
+
+    # latency
+    p_latency = sub.add_parser("latency", help="Message-to-reply latency report (p50/p95/p99)")
+    latency.add_report_args(p_latency)
+
+    # profile-summary
+    p_prof = sub.add_parser("profile-summary", help="Summarize recent --profile runs")
+    profiling.add_summary_args(p_prof)
+
+    args = parser.parse_args(argv)
+    if args.command == "profile-summary":
+        profiling.summary("email", runs=args.runs, top=args.top, label=args.label, sort=args.sort)
+        return
+
+    watcher = None
+    if config is None:
+        watcher = ConfigWatcher()
+        config = watcher.get()
+
+    profile = profiling.requested(args.profile)
+
+    if args.command == "receive":
+        try:
+            asyncio.run(cmd_receive(watcher.get if watcher else lambda: config,
+                                    listen=args.listen, lmtp=not args.smtp))
+        except KeyboardInterrupt:
+            pass
+        return
 
     if args.command == "poll":
         if args.once:
-            cmd_poll(config, once=True)
+            with profiling.profile("email", "poll", profile):
+                cmd_poll(config, once=True, catchup=args.catchup)
         else:
             interval = int(os.environ.get("EMAIL_POLL_INTERVAL", 120))
             print(f"[{datetime.now()}] Email poller starting "
                   f"(host={config['imap_host']}, interval={interval}s)")
+            catchup = args.catchup
             while True:
-                cmd_poll(config, once=True)
+                with profiling.profile("email", "poll", profile):
+                    cmd_poll(watcher.get() if watcher else config, once=True, catchup=catchup)
+                catchup = False
                 time.sleep(interval)
+        return
+
+    with profiling.profile("email", args.command, profile):
+        run_command(config, args)
+
 
-    elif args.command == "send":
+def run_command(config, args):
+    if args.command == "send":
         cmd_send(config, args.to, args.subject, args.body,
                  attachments=args.attach or None)
 
@@ -782,12 +2421,45 @@ Examples:
         cmd_reply(config, args.thread_id, args.body,
                   attachments=args.attach or None)
 
+    elif args.command == "bulk-send":
+        body = args.body
+        if args.body_file:
+            body = Path(args.body_file).read_text(encoding="utf-8")
+        cmd_bulk_send(config, args.recipients, args.subject, body, attachments=args.attach or None,
+                      connections=args.connections, rate=args.rate, report=args.report,
+                      dry_run=args.dry_run)
+
     elif args.command == "threads":
         cmd_threads(config, limit=args.limit)
 
     elif args.command == "thread":
         cmd_thread_detail(config, args.thread_id)
 
+    elif args.command == "show":
+        cmd_show(config, args.email_id, original=args.original)
+
+    elif args.command == "export":
+        cmd_export(config, args.output)
+
+    elif args.command == "import":
+        if args.mbox or args.maildir:
+            cmd_import_archive(config, args.mbox or args.maildir, "mbox" if args.mbox else "maildir")
+        else:
+            cmd_import(config, args.file)
+
+    elif args.command == "backup":
+        cmd_backup(config, args.dest)
+
+    elif args.command == "partitions":
+        cmd_partitions(config, archive=args.archive, hot_months=args.hot_months)
+
+    elif args.command == "latency":
+        db = get_email_db(config)
+        try:
+            latency.report("email", [db], days=args.days, top=args.top)
+        finally:
+            db.close()
+
 
 if __name__ == "__main__":
     main()
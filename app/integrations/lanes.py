@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Keyed worker lanes: concurrency across conversations, order within one.
+
+KeyedExecutor hashes each job's key (a Signal sender, an email thread) onto
+one of N lanes. A lane is a single worker thread with its own FIFO queue, so
+jobs with the same key run one after another in submission order while jobs
+of other keys proceed on the other lanes — one slow message (a busy atlas.db,
+a trigger whose session socket doesn't answer) only holds up the
+conversations that share its lane.
+
+Lane depth (jobs queued + running) is tracked per lane, with the peak since
+the last export. export() writes it to ~/.index/metrics/<name>.json:
+
+  {"name": "signal-listen", "updated_at": "...", "lanes": [
+      {"lane": 0, "depth": 0, "peak": 3, "done": 120}, ...]}
+
+Workers don't open anything themselves — a job that needs a database opens
+its own connection (SQLite connections stay on their thread).
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import zlib
+from concurrent.futures import Future
+from datetime import datetime
+
+METRICS_DIR = os.environ["HOME"] + "/.index/metrics"
+
+
+class KeyedExecutor:
+    """`lanes` worker threads; jobs with the same key run on the same lane, in order."""
+
+    def __init__(self, lanes, name):
+        self.name = name
+        self._queues = [queue.SimpleQueue() for _ in range(max(lanes, 1))]
+        self._lock = threading.Lock()
+        self._depth = [0] * len(self._queues)
+        self._peak = [0] * len(self._queues)
+        self._done = [0] * len(self._queues)
+        self._threads = [threading.Thread(target=self._work, args=(lane,), daemon=True,
+                                          name=f"{name}-lane-{lane}")
+                         for lane in range(len(self._queues))]
+        for t in self._threads:
+            t.start()
+
+    def lane_for(self, key):
+        # crc32, not hash(): stable across processes, so logs and metrics line up between runs
+        return zlib.crc32(str(key).encode()) % len(self._queues)
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) on the key's lane. Returns a Future."""
+        lane = self.lane_for(key)
+        future = Future()
+        with self._lock:
+            self._depth[lane] += 1
+            self._peak[lane] = max(self._peak[lane], self._depth[lane])
+        self._queues[lane].put((future, fn, args, kwargs))
+        return future
+
+    def _work(self, lane):
+        while True:
+            job = self._queues[lane].get()
+            if job is None:
+                return
+            future, fn, args, kwargs = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                self._depth[lane] -= 1
+                self._done[lane] += 1
+
+    def depths(self):
+        with self._lock:
+            return list(self._depth)
+
+    def export(self):
+        """Write per-lane depth, peak (since the last export) and done counts; resets the peaks."""
+        with self._lock:
+            lanes = [{"lane": i, "depth": d, "peak": p, "done": n}
+                     for i, (d, p, n) in enumerate(zip(self._depth, self._peak, self._done))]
+            self._peak = list(self._depth)
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{self.name}.json")
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump({"name": self.name, "updated_at": datetime.now().isoformat(timespec="seconds"),
+                           "lanes": lanes}, f, indent=2)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"[{datetime.now()}] Lane metrics not written ({e})", file=sys.stderr)
+        return lanes
+
+    def shutdown(self):
+        """Let every lane finish its queued jobs, then stop the workers."""
+        for q in self._queues:
+            q.put(None)
+        for t in self._threads:
+            t.join()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Message-to-reply latency for the channel add-ons (`latency` subcommand).
+
+The channel core keeps one reply_latency row per inbound message that is
+meant to wake the agent: written with the message (channel_core.ingest),
+updated when its trigger fires and when an outbound message in the same
+session answers it (channel_core.record_reply from `email reply` /
+`signal send`). Each is one small write inside a transaction that commits
+anyway, so it runs for every message.
+
+Stages (unix times; a missing send time counts from storing):
+
+  ingest    sent → stored        transport, IMAP poll interval, listener backlog
+  trigger   stored → triggered   priority batching, digests, retries
+  response  triggered → replied  the agent's session
+  total     sent → replied
+
+Percentiles are nearest-rank over the rows of the report window.
+"""
+
+import math
+import time
+
+STAGES = ("ingest", "trigger", "response", "total")
+
+
+def add_report_args(parser):
+    """Options of the add-ons' `latency` subcommand."""
+    parser.add_argument("--days", type=int, default=30, help="Messages stored within the last N days")
+    parser.add_argument("--top", type=int, default=10, help="Contacts listed (slowest median reply first)")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted `values` (None when empty)."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    if seconds < 90:
+        return f"{seconds:.1f}s"
+    if seconds < 5400:
+        return f"{seconds // 60:.0f}m{seconds % 60:02.0f}s"
+    return f"{seconds // 3600:.0f}h{seconds % 3600 // 60:02.0f}m"
+
+
+def stages(sent_at, stored_at, triggered_at, replied_at):
+    """{stage: seconds} for the stages a row has reached (clock skew clamped to 0)."""
+    start = sent_at or stored_at
+    out = {"ingest": max(0.0, stored_at - start)}
+    if triggered_at:
+        out["trigger"] = max(0.0, triggered_at - stored_at)
+    if replied_at:
+        out["total"] = max(0.0, replied_at - start)
+        if triggered_at:
+            out["response"] = max(0.0, replied_at - triggered_at)
+    return out
+
+
+def load(dbs, days):
+    """(contact, trigger_name, stages) of the rows stored within `days`, over all `dbs`."""
+    since = time.time() - days * 86400
+    rows = []
+    for db in dbs:
+        for contact, trigger_name, *times in db.execute("""
+            SELECT contact, trigger_name, sent_at, stored_at, triggered_at, replied_at
+            FROM reply_latency WHERE stored_at >= ?
+        """, (since,)):
+            rows.append((contact, trigger_name, stages(*times)))
+    return rows
+
+
+def _summary(rows):
+    values = {stage: sorted(s[stage] for *_, s in rows if stage in s) for stage in STAGES}
+    return {stage: (len(v), percentile(v, 50), percentile(v, 95), percentile(v, 99))
+            for stage, v in values.items()}
+
+
+def _print_stages(summary):
+    print(f"{'Stage':<10} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage in STAGES:
+        n, p50, p95, p99 = summary[stage]
+        print(f"{stage:<10} {n:>6} {duration(p50):>9} {duration(p95):>9} {duration(p99):>9}")
+
+
+def report(channel, dbs, days=30, top=10):
+    """Print p50/p95/p99 per stage for the channel, per trigger and per contact."""
+    rows = load(dbs, days)
+    if not rows:
+        print(f"No {channel} messages with latency data in the last {days} day(s).")
+        return
+    overall = _summary(rows)
+    triggered, answered = overall["trigger"][0], overall["total"][0]
+    print(f"{channel}, last {days} day(s): {len(rows)} message(s), {triggered} triggered, "
+          f"{answered} answered\n")
+    _print_stages(overall)
+
+    by_trigger = {}
+    for row in rows:
+        by_trigger.setdefault(row[1], []).append(row)
+    print("\nBy trigger:")
+    print(f"{'Trigger':<24} {'n':>6} {'answered':>9} {'start p50':>10} {'reply p50':>10} "
+          f"{'reply p95':>10} {'reply p99':>10}")
+    for name, group in sorted(by_trigger.items()):
+        s = _summary(group)
+        print(f"{name:<24} {len(group):>6} {s['total'][0]:>9} {duration(s['trigger'][1]):>10} "
+              f"{duration(s['response'][1]):>10} {duration(s['response'][2]):>10} "
+              f"{duration(s['response'][3]):>10}")
+
+    by_contact = {}
+    for row in rows:
+        by_contact.setdefault(row[0], []).append(row)
+    contacts = [(contact, _summary(group)) for contact, group in by_contact.items()]
+    contacts = [c for c in contacts if c[1]["total"][0]]
+    if not contacts:
+        return
+    contacts.sort(key=lambda c: -c[1]["total"][1])
+    print(f"\nBy contact (answered; slowest median first, top {top}):")
+    print(f"{'Contact':<36} {'n':>5} {'ingest p50':>10} {'start p50':>10} {'reply p50':>10} "
+          f"{'total p50':>10} {'total p95':>10}")
+    for contact, s in contacts[:top]:
+        print(f"{contact[:36]:<36} {s['total'][0]:>5} {duration(s['ingest'][1]):>10} "
+              f"{duration(s['trigger'][1]):>10} {duration(s['response'][1]):>10} "
+              f"{duration(s['total'][1]):>10} {duration(s['total'][2]):>10}")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Monthly partitions for the add-ons' message tables (email `emails`, Signal `messages`).
+
+The account DB stays the hot file: every write goes there. archive() moves
+whole calendar months older than `hot_months` into one SQLite file per month,
+<account>.parts/<YYYY-MM>.db next to the DB, records them in the `partitions`
+catalog table, compacts them and makes them read-only. Rows still referenced by
+the ingest journal stay hot until they are delivered.
+
+Reads that need older rows go through scan(): the hot DB first, then only the
+partitions whose time / id range can match, newest first, each ATTACHed
+read-only (immutable — no locking) for one query and detached again. A query
+with a limit stops opening partitions once it has enough rows.
+
+A partition file that was moved away (cold storage) is skipped with a warning;
+put it back to make its rows visible again.
+"""
+
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime
+
+CATALOG_SCHEMA = """
+    -- Months moved out of the hot DB into <db>.parts/<month>.db (see partitions.py)
+    CREATE TABLE IF NOT EXISTS partitions (
+        table_name  TEXT NOT NULL,
+        month       TEXT NOT NULL,
+        row_count   INTEGER NOT NULL DEFAULT 0,
+        min_id      INTEGER NOT NULL DEFAULT 0,
+        max_id      INTEGER NOT NULL DEFAULT 0,
+        first_at    TEXT NOT NULL DEFAULT '',
+        last_at     TEXT NOT NULL DEFAULT '',
+        archived_at TEXT NOT NULL DEFAULT (datetime('now')),
+        PRIMARY KEY (table_name, month)
+    );
+"""
+
+
+def parts_dir(db):
+    """Directory holding the partition files of the connection's main DB."""
+    path = next(r[2] for r in db.execute("PRAGMA database_list") if r[1] == "main")
+    return os.path.splitext(path)[0] + ".parts"
+
+
+def _end_transaction(db):
+    # ATTACH / DETACH are not allowed inside a transaction
+    if db.in_transaction:
+        db.commit()
+
+
+# --- Archive ---
+
+def archive(db, table, hot_months):
+    """Move months older than the newest `hot_months` out of the hot DB. Returns [(month, rows)].
+
+    Each month is copied into its partition and committed before the hot rows
+    are deleted, so an interrupted run just repeats the copy (INSERT OR IGNORE).
+    """
+    directory = parts_dir(db)
+    cutoff = db.execute("SELECT date('now', 'start of month', ?)",
+                        (f"-{max(hot_months, 1) - 1} months",)).fetchone()[0]
+    keep = "id NOT IN (SELECT record_id FROM ingest_journal)"
+    months = [r[0] for r in db.execute(f"""
+        SELECT DISTINCT substr(created_at, 1, 7) FROM {table}
+        WHERE created_at < ? AND {keep} ORDER BY 1
+    """, (cutoff,))]
+    schema = [r[0] for r in db.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL ORDER BY type DESC",
+        (table,))]  # the table first, then its indexes
+
+    done = []
+    for month in months:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{month}.db")
+        if os.path.exists(path):
+            os.chmod(path, 0o644)  # finishing an interrupted run
+        part = sqlite3.connect(path)
+        try:
+            if not part.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone():
+                for statement in schema:
+                    part.execute(statement)
+                part.commit()
+        finally:
+            part.close()
+
+        _end_transaction(db)
+        db.execute("ATTACH ? AS part", (path,))
+        try:
+            columns = ", ".join(r[1] for r in db.execute(f"PRAGMA part.table_info({table})"))
+            db.execute(f"""
+                INSERT OR IGNORE INTO part.{table} ({columns})
+                SELECT {columns} FROM main.{table}
+                WHERE substr(created_at, 1, 7) = ? AND created_at < ? AND {keep}
+            """, (month, cutoff))
+            db.commit()
+            moved = db.execute(f"DELETE FROM main.{table} WHERE id IN (SELECT id FROM part.{table})").rowcount
+            db.execute(f"""
+                INSERT INTO partitions (table_name, month, row_count, min_id, max_id, first_at, last_at)
+                SELECT ?, ?, COUNT(*), MIN(id), MAX(id), MIN(created_at), MAX(created_at)
+                FROM part.{table} WHERE 1
+                ON CONFLICT(table_name, month) DO UPDATE SET
+                    row_count = excluded.row_count, min_id = excluded.min_id, max_id = excluded.max_id,
+                    first_at = excluded.first_at, last_at = excluded.last_at, archived_at = datetime('now')
+            """, (table, month))
+            db.commit()
+        finally:
+            if db.in_transaction:
+                db.rollback()
+            db.execute("DETACH part")
+
+        part = sqlite3.connect(path)
+        try:
+            part.execute("VACUUM")
+        finally:
+            part.close()
+        os.chmod(path, 0o444)
+        done.append((month, moved))
+        print(f"[{datetime.now()}] Archived {moved} {table} row(s) of {month} to {path}")
+
+    if done:
+        try:
+            db.execute("VACUUM")  # hand the freed pages back; the hot file stays small
+        except sqlite3.OperationalError as e:
+            print(f"[{datetime.now()}] Hot DB not compacted ({e}); freed pages are reused", file=sys.stderr)
+    return done
+
+
+def maybe_archive(db, table, hot_months):
+    """archive() at most once per day, for pollers (hot_months 0 = off)."""
+    if hot_months <= 0:
+        return []
+    today = date.today().isoformat()
+    row = db.execute("SELECT value FROM state WHERE key = 'partitions_checked'").fetchone()
+    if row and row[0] == today:
+        return []
+    done = archive(db, table, hot_months)
+    db.execute("INSERT INTO state (key, value) VALUES ('partitions_checked', ?) "
+               "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (today,))
+    db.commit()
+    return done
+
+
+# --- Reads ---
+
+def catalog(db, table, since=None, record_id=None):
+    """Catalog rows (month, row_count, min_id, max_id, first_at, last_at), newest first,
+    limited to partitions that can hold rows created at/after `since` or the row `record_id`."""
+    where, params = ["table_name = ?"], [table]
+    if since:
+        where.append("last_at >= ?")
+        params.append(since)
+    if record_id is not None:
+        where.append("? BETWEEN min_id AND max_id")
+        params.append(record_id)
+    return db.execute(f"""
+        SELECT month, row_count, min_id, max_id, first_at, last_at FROM partitions
+        WHERE {' AND '.join(where)} ORDER BY month DESC
+    """, params).fetchall()
+
+
+@contextmanager
+def attached(db, month):
+    """ATTACH one partition read-only as `part`; yields None when its file is missing."""
+    path = os.path.join(parts_dir(db), f"{month}.db")
+    if not os.path.exists(path):
+        print(f"Partition {month} not available ({path} missing), skipping", file=sys.stderr)
+        yield None
+        return
+    _end_transaction(db)
+    db.execute("ATTACH ? AS part", (f"file:{path}?mode=ro&immutable=1",))
+    try:
+        yield "part"
+    finally:
+        _end_transaction(db)
+        db.execute("DETACH part")
+
+
+def _select(db, schema, table, columns, where, params, limit):
+    existing = {r[1] for r in db.execute(f"PRAGMA {schema}.table_info({table})")}
+    # Partitions keep the schema of their month; newer columns read as NULL
+    cols = ", ".join(c if c in existing else f"NULL AS {c}" for c in columns)
+    sql = f"SELECT {cols} FROM {schema}.{table} WHERE {where} ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return db.execute(sql, params).fetchall()
+
+
+def scan(db, table, columns, where="1", params=(), since=None, record_id=None, limit=None):
+    """Rows of `table` across the hot DB and the partitions that can match, newest first.
+
+    `columns` must include created_at and id (the sort keys). `since` and
+    `record_id` only narrow which partitions are opened — repeat them in
+    `where` to filter rows.
+    """
+    rows = _select(db, "main", table, columns, where, params, limit)
+    for month, *_ in catalog(db, table, since=since, record_id=record_id):
+        if limit is not None and len(rows) >= limit:
+            break
+        with attached(db, month) as schema:
+            if schema:
+                rows += _select(db, schema, table, columns, where, params,
+                                None if limit is None else limit - len(rows))
+    return rows
+
+
+def partition_paths(db, table):
+    """(month, path) of the existing partition files, oldest first."""
+    directory = parts_dir(db)
+    return [(month, os.path.join(directory, f"{month}.db"))
+            for month, *_ in reversed(catalog(db, table))
+            if os.path.exists(os.path.join(directory, f"{month}.db"))]
+
+
+def print_catalog(db, table):
+    rows = catalog(db, table)
+    hot = db.execute(f"SELECT COUNT(*), MIN(created_at) FROM {table}").fetchone()
+    print(f"Hot DB: {hot[0]} row(s){f' since {hot[1][:10]}' if hot[1] else ''}")
+    if not rows:
+        print("No partitions.")
+        return
+    directory = parts_dir(db)
+    print(f"{'Month':<8} {'Rows':>8} {'IDs':>17} {'Size KB':>9}  File")
+    for month, count, min_id, max_id, _, _ in rows:
+        path = os.path.join(directory, f"{month}.db")
+        size = f"{os.path.getsize(path) // 1024}" if os.path.exists(path) else "missing"
+        print(f"{month:<8} {count:>8} {f'{min_id}-{max_id}':>17} {size:>9}  {path}")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling for the add-on commands.
+
+Enabled with `--profile` (e.g. `email-addon.py --profile poll --once`) or
+ATLAS_PROFILE=1 in the environment — the latter also covers supervisord
+services and the warm add-on server. Each profiled unit of work (one command,
+one poll cycle, one message handled by `signal listen`) writes two files to
+~/.index/profiles/<addon>/:
+
+  <time>-<label>.prof   cProfile stats (pstats / snakeviz compatible)
+  <time>-<label>.json   wall time, peak traced memory, top allocations
+
+Only the newest KEEP_RUNS runs per add-on are kept. `profile-summary` merges
+recent runs and prints the hottest functions and allocation sites.
+
+One run is profiled at a time: Python 3.12+ allows a single active profiler
+per process, so a unit of work that starts while another is being profiled
+(another `signal listen` lane, a concurrent warm-server request) runs
+unprofiled. cProfile records the thread that runs the unit of work;
+tracemalloc is process-wide, so allocations of concurrent threads show up in
+the run. Parse workers of `email poll` run in child processes and are not
+profiled. Profiling never keeps the wrapped work from running.
+"""
+
+import cProfile
+import glob
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILES_DIR = os.environ["HOME"] + "/.index/profiles"
+KEEP_RUNS = int(os.environ.get("ATLAS_PROFILE_KEEP", 50))  # per add-on
+TOP_ALLOCATIONS = 15
+
+_active = threading.Lock()  # held by the one run being profiled
+
+
+def requested(flag=False):
+    """True when profiling was asked for by flag or the ATLAS_PROFILE environment switch."""
+    return flag or os.environ.get("ATLAS_PROFILE", "").lower() not in ("", "0", "false", "no")
+
+
+def _rotate(directory):
+    runs = sorted(glob.glob(os.path.join(directory, "*.prof")))
+    for path in runs[:-KEEP_RUNS] if KEEP_RUNS > 0 else []:
+        for stale in (path, path[:-len(".prof")] + ".json"):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def profile(addon, label, enabled=True):
+    """Profile the enclosed block as one run named `label`.
+
+    A no-op unless enabled, while another run is being profiled, or when the
+    profiler can't start (e.g. a debugger holds the profiling hook).
+    """
+    if not enabled or not _active.acquire(blocking=False):
+        yield
+        return
+
+    try:
+        traced = not tracemalloc.is_tracing()  # stop it again only if we started it
+        profiler = None
+        try:
+            if traced:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.take_snapshot()
+            profiler = cProfile.Profile()
+            started_at = datetime.now()
+            start = time.perf_counter()
+            profiler.enable()
+        except Exception as e:
+            print(f"[{datetime.now()}] Not profiling {label}: {e}", file=sys.stderr)
+            profiler = None
+            if traced:
+                tracemalloc.stop()
+        if profiler is None:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            profiler.disable()
+            wall = time.perf_counter() - start
+            try:
+                _write_run(addon, label, profiler, baseline, started_at, wall)
+            except Exception as e:
+                print(f"[{datetime.now()}] Profile of {label} not written: {e}", file=sys.stderr)
+            finally:
+                if traced:
+                    tracemalloc.stop()
+    finally:
+        _active.release()
+
+
+def _write_run(addon, label, profiler, baseline, started_at, wall):
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    top = snapshot.compare_to(baseline, "lineno")[:TOP_ALLOCATIONS]
+    directory = os.path.join(PROFILES_DIR, addon)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{started_at:%Y%m%d-%H%M%S-%f}-{label}")
+    profiler.dump_stats(base + ".prof")
+    with open(base + ".json", "w") as f:
+        json.dump({
+            "addon": addon,
+            "label": label,
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(wall, 4),
+            "peak_kb": peak // 1024,
+            "top_allocations": [
+                {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                 "bytes": s.size_diff, "count": s.count_diff}
+                for s in top
+            ],
+        }, f, indent=2)
+    _rotate(directory)
+    print(f"[{datetime.now()}] Profile written: {base}.prof ({wall:.3f}s, peak {peak // 1024} KB)",
+          file=sys.stderr)
+
+
+# --- Summary ---
+
+def add_summary_args(parser):
+    """Options of the add-ons' `profile-summary` subcommand."""
+    parser.add_argument("--runs", type=int, default=20, help="Newest runs to include")
+    parser.add_argument("--top", type=int, default=25, help="Functions / allocation sites to show")
+    parser.add_argument("--label", default=None, help="Only runs of this command (e.g. poll, send)")
+    parser.add_argument("--sort", choices=("tottime", "cumtime"), default="tottime",
+                        help="Rank by own time or by time including callees")
+
+
+def _short(path):
+    parts = path.replace(os.sep, "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def summary(addon, runs=20, top=25, label=None, sort="tottime"):
+    """Print the hottest functions and allocation sites over the newest `runs` runs."""
+    directory = os.path.join(PROFILES_DIR, addon)
+    pattern = f"*-{label}.prof" if label else "*.prof"
+    files = sorted(glob.glob(os.path.join(directory, pattern)))[-runs:]
+    if not files:
+        print(f"No profiles in {directory}. Run a command with --profile or ATLAS_PROFILE=1.")
+        return
+
+    meta = []
+    for path in files:
+        try:
+            with open(path[:-len(".prof")] + ".json") as f:
+                meta.append(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    print(f"{len(files)} run(s) of {addon}{f' {label}' if label else ''} "
+          f"({os.path.basename(files[0])[:15]} .. {os.path.basename(files[-1])[:15]})\n")
+
+    by_label = {}
+    for m in meta:
+        by_label.setdefault(m["label"], []).append(m)
+    print(f"{'Label':<14} {'Runs':>5} {'Avg s':>9} {'Max s':>9} {'Peak KB':>9}")
+    for name, ms in sorted(by_label.items()):
+        walls = [m["wall_seconds"] for m in ms]
+        print(f"{name:<14} {len(ms):>5} {sum(walls) / len(walls):>9.3f} {max(walls):>9.3f} "
+              f"{max(m['peak_kb'] for m in ms):>9}")
+
+    stats = pstats.Stats(*files)
+    column = {"tottime": 2, "cumtime": 3}[sort]
+    rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][column])[:top]
+    print(f"\nHottest functions (by {sort}, summed over runs):")
+    print(f"{'Calls':>10} {'Own s':>9} {'Cum s':>9}  Function")
+    for (filename, lineno, func), (_, calls, tottime, cumtime, _) in rows:
+        where = func if filename == "~" else f"{func} ({_short(filename)}:{lineno})"
+        print(f"{calls:>10} {tottime:>9.3f} {cumtime:>9.3f}  {where}")
+
+    allocations = {}
+    for m in meta:
+        for a in m["top_allocations"]:
+            size, count, seen = allocations.get(a["where"], (0, 0, 0))
+            allocations[a["where"]] = (max(size, a["bytes"]), count + a["count"], seen + 1)
+    if allocations:
+        print("\nTop allocation sites (largest growth in one run):")
+        print(f"{'Max KB':>9} {'Blocks':>9} {'Runs':>5}  Where")
+        for where, (size, count, seen) in sorted(allocations.items(), key=lambda kv: -kv[1][0])[:top]:
+            print(f"{size / 1024:>9.1f} {count:>9} {seen:>5}  {_short(where)}")
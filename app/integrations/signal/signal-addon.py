@@ -4,35 +4,59 @@ Signal Communication Add-on for Atlas.
 
 All Signal operations in one module: polling signal-cli, injecting messages,
 sending/replying, and contact/conversation tracking. Uses its own SQLite
-database per Signal number.
+database per Signal number; several numbers (signal.numbers) are served by one
+process, `--account <number>` selects one (default: the primary number).
 
 Subcommands:
+  listen                         Listen on the signal-cli daemon socket(s), process each message
   poll     [--once]              Poll signal-cli for new messages, process each
   incoming <sender> <message>    Inject a message: write to DB + inbox, fire trigger
   send     <number> <message>    Send a Signal message (supports --attach for files)
   contacts [--limit N]           List known contacts
   history  <number> [--limit]    Show message history with a contact
+  export   [--output FILE]       Stream the number's DB as NDJSON (default: stdout)
+  import   <file|->              Load an NDJSON export (existing rows are kept)
+  backup   <dest.db>             Online backup of the number's DB, copied in small steps
+  partitions [--archive]         List monthly partitions / move old months out of the hot DB
+  latency  [--days N]            Message-to-reply latency (ingest / trigger start / response)
+  profile-summary [--runs N]     Hottest functions / allocations of recent --profile runs
+
+Global option --profile (or ATLAS_PROFILE=1): cProfile + tracemalloc per command,
+poll cycle or handled message, written to ~/.index/profiles/signal/ (see profiling.py).
 """
 
 import argparse
 import json
 import os
 import re
-import sqlite3
+import socket
 import subprocess
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import channel_core  # noqa: E402  (app/integrations/channel_core.py)
+import dbtransfer  # noqa: E402  (app/integrations/dbtransfer.py)
+import lanes  # noqa: E402  (app/integrations/lanes.py)
+import latency  # noqa: E402  (app/integrations/latency.py)
+import partitions  # noqa: E402  (app/integrations/partitions.py)
+import profiling  # noqa: E402  (app/integrations/profiling.py)
+
 # --- Paths ---
 CONFIG_PATH = os.environ["HOME"] + "/config.yml"
-ATLAS_DB_PATH = os.environ["HOME"] + "/.index/atlas.db"
 SIGNAL_DB_DIR = os.environ["HOME"] + "/.index/signal"
-WAKE_PATH = os.environ["HOME"] + "/.index/.wake"
-TRIGGER_SCRIPT = "/atlas/app/triggers/trigger.sh"
 TRIGGER_NAME = "signal-chat"
+PAYLOAD_MESSAGE_CHARS = 8000  # trigger payloads no longer pass through argv
+CONTEXT_MESSAGES = 10         # recent messages per contact snapshot sent with each trigger
+CONTEXT_TEXT_CHARS = 300      # per message in the snapshot
 DAEMON_SOCKET = "/tmp/signal.sock"
+FLUSH_INTERVAL = 15           # seconds between deferred-trigger checks in `listen`
+
+# Set by addon-server.py: keep DB connections open between commands
+KEEP_WARM = False
 
 # signal-cli binary: check PATH first, then known workspace location
 def _find_signal_cli_bin():
@@ -49,35 +73,68 @@ def _find_signal_cli_bin():
 
 def load_config():
     """Load Signal config from config.yml, with env overrides."""
-    cfg = {}
-    if os.path.exists(CONFIG_PATH):
-        try:
-            import yaml
-            with open(CONFIG_PATH) as f:
-                data = yaml.safe_load(f) or {}
-            cfg = data.get("signal", {})
-        except ImportError:
-            pass
+    cfg = channel_core.load_section(CONFIG_PATH, "signal")
+
+    # Primary number first, then any additional lines (signal.numbers)
+    numbers = []
+    for n in [os.environ.get("SIGNAL_NUMBER", cfg.get("number", ""))] + list(cfg.get("numbers") or []):
+        n = str(n or "").strip()
+        if n and n not in numbers:
+            numbers.append(n)
 
+    whitelist = cfg.get("whitelist", [])
     return {
-        "number": os.environ.get("SIGNAL_NUMBER", cfg.get("number", "")),
-        "whitelist": cfg.get("whitelist", []),
+        "number": numbers[0] if numbers else "",
+        "numbers": numbers,
+        "daemon_socket": cfg.get("daemon_socket", DAEMON_SOCKET),
+        "sockets": {str(k): v for k, v in (cfg.get("sockets") or {}).items()},
+        "whitelist": whitelist,
+        "whitelist_set": frozenset(str(n).strip() for n in whitelist or []),
+        "priority_rules": channel_core.PriorityRules(cfg.get("priority")),
+        "hot_months": int(cfg.get("hot_months", 0)),
+        "lanes": int(cfg.get("lanes", 4)),
     }
 
 
+def for_account(config, account):
+    """Config scoped to one of the configured numbers (None/"" = primary)."""
+    if not account or account == config["number"]:
+        return config
+    if account not in config["numbers"]:
+        raise ValueError(f"Signal number {account} is not configured (signal.numbers)")
+    return {**config, "number": account}
+
+
+def daemon_socket_for(config):
+    """Socket of the daemon serving config["number"]: its own, or the shared multi-account one."""
+    return config["sockets"].get(config["number"], config["daemon_socket"])
+
+
+def session_key_for(config, sender):
+    """Trigger session key: the sender for the primary number, "<number>/<sender>" otherwise."""
+    if not config["numbers"] or config["number"] == config["numbers"][0]:
+        return sender
+    return f"{config['number']}/{sender}"
+
+
+class ConfigWatcher(channel_core.ConfigWatcher):
+    """Signal config, reloaded when config.yml changes."""
+
+    def __init__(self, loader=None, path=None):
+        super().__init__(loader or load_config, path or CONFIG_PATH)
+
+
 # --- Signal Database ---
 
 def get_signal_db(config):
     """Open (or create) the per-number Signal database."""
-    os.makedirs(SIGNAL_DB_DIR, exist_ok=True)
-
     number = re.sub(r"[^0-9+]", "", config.get("number", "default"))
     db_path = os.path.join(SIGNAL_DB_DIR, f"{number}.db")
+    return channel_core.open_db(db_path, migrate_signal_db, keep_warm=KEEP_WARM)
 
-    db = sqlite3.connect(db_path)
-    db.execute("PRAGMA journal_mode=WAL")
-    db.execute("PRAGMA busy_timeout=5000")
 
+def migrate_signal_db(db):
+    """Signal tables on top of the core ones (state, dedupe, ingest_journal)."""
     db.executescript("""
         CREATE TABLE IF NOT EXISTS contacts (
             number          TEXT PRIMARY KEY,
@@ -98,11 +155,17 @@ def get_signal_db(config):
             FOREIGN KEY (contact_number) REFERENCES contacts(number)
         );
 
+        -- Last CONTEXT_MESSAGES messages per contact in compact form (see push_contact_context)
+        CREATE TABLE IF NOT EXISTS contact_context (
+            contact_number TEXT PRIMARY KEY,
+            messages       TEXT NOT NULL DEFAULT '[]',
+            updated_at     TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+
         CREATE INDEX IF NOT EXISTS idx_messages_contact ON messages(contact_number);
         CREATE INDEX IF NOT EXISTS idx_messages_direction ON messages(direction);
     """)
-
-    return db
+    db.executescript(partitions.CATALOG_SCHEMA)
 
 
 def update_contact(db, number, name=""):
@@ -117,6 +180,42 @@ def update_contact(db, number, name=""):
     """, (number, name))
 
 
+def compact_entry(direction, body, created_at=None):
+    """One message in a context snapshot: direction, UTC time and a short text."""
+    return {
+        "dir": direction,
+        "at": (created_at or time.strftime("%Y-%m-%d %H:%M", time.gmtime()))[:16],
+        "text": " ".join(body.split())[:CONTEXT_TEXT_CHARS],
+    }
+
+
+def push_contact_context(db, number, entry):
+    """Append one message to the contact's context snapshot (caller commits).
+
+    Returns the snapshot as it was before this message. A contact without a
+    snapshot yet is seeded from stored messages; call this before inserting
+    the new message row.
+    """
+    row = db.execute("SELECT messages FROM contact_context WHERE contact_number = ?",
+                     (number,)).fetchone()
+    if row:
+        previous = json.loads(row[0])
+    else:
+        rows = db.execute("""
+            SELECT direction, body, created_at FROM messages
+            WHERE contact_number = ? ORDER BY id DESC LIMIT ?
+        """, (number, CONTEXT_MESSAGES)).fetchall()
+        previous = [compact_entry(*r) for r in reversed(rows)]
+
+    db.execute("""
+        INSERT INTO contact_context (contact_number, messages, updated_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT(contact_number) DO UPDATE SET
+            messages = excluded.messages, updated_at = excluded.updated_at
+    """, (number, json.dumps((previous + [entry])[-CONTEXT_MESSAGES:])))
+    return previous
+
+
 # --- POLL command (signal-cli → incoming) ---
 
 def cmd_poll(config, once=False):
@@ -142,101 +241,280 @@ def cmd_poll(config, once=False):
     except subprocess.TimeoutExpired:
         output = ""
 
-    if not output:
-        return
+    db = get_signal_db(config)
+    adapter = SignalAdapter(config)
+    try:
+        channel_core.resume_journal(db, adapter)
+
+        messages = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            message = envelope_message(msg.get("envelope", {}))
+            if message:
+                messages.append(message)
+
+        # One receive is one batch: a single inbox transaction for all of it
+        ingest_incoming(db, config, messages)
+        channel_core.flush_deferred(db, adapter)
+        partitions.maybe_archive(db, "messages", config["hot_months"])
+    finally:
+        db.close()
 
-    for line in output.splitlines():
-        if not line.strip():
-            continue
 
+def envelope_message(envelope):
+    """Normalized message for a received envelope, or None for receipts, typing and empty messages."""
+    dm = envelope.get("dataMessage") or {}
+    sender = envelope.get("sourceNumber") or envelope.get("source", "")
+    body = dm.get("message") or ""
+
+    if not sender or not body:
+        return None
+
+    return incoming_message(sender, body, name=envelope.get("sourceName", ""),
+                            timestamp=str(envelope.get("timestamp", "")))
+
+
+def handle_envelope(config, envelope):
+    """Process one envelope from the daemon listener."""
+    message = envelope_message(envelope)
+    if message:
+        db = get_signal_db(config)
         try:
-            msg = json.loads(line)
-        except json.JSONDecodeError:
-            continue
+            ingest_incoming(db, config, [message])
+        finally:
+            db.close()
 
-        envelope = msg.get("envelope", {})
-        dm = envelope.get("dataMessage", {})
-        sender = envelope.get("source", envelope.get("sourceNumber", ""))
-        body = dm.get("message", "")
-        name = envelope.get("sourceName", "")
-        ts = str(envelope.get("timestamp", ""))
 
-        if not sender or not body:
-            continue
+# --- LISTEN command (signal-cli daemon → incoming) ---
 
-        cmd_incoming(config, sender, body, name=name, timestamp=ts)
+def listener_routes(config):
+    """Map each daemon socket to the numbers it serves."""
+    routes = {}
+    for number in config["numbers"]:
+        path = daemon_socket_for(for_account(config, number))
+        routes.setdefault(path, []).append(number)
+    return routes
 
 
-# --- INCOMING command (core: inject message into session) ---
+def route_notification(config, numbers, notification):
+    """Pick the number a receive notification belongs to. None if it is not ours."""
+    # Multi-account daemons name the account; a per-number socket implies it
+    account = (notification.get("params") or {}).get("account") or ""
+    if not account and len(numbers) == 1:
+        account = numbers[0]
+    return account if account in config["numbers"] else None
 
-def cmd_incoming(config, sender, message, name="", timestamp=""):
-    """Inject an incoming message: store in DB, write to inbox, fire trigger."""
-    # Whitelist check
-    if config["whitelist"] and sender not in config["whitelist"]:
-        print(f"Blocked: {sender} not in whitelist", file=sys.stderr)
-        return
 
-    db = get_signal_db(config)
-    ts = timestamp or datetime.now().isoformat()
+def process_envelope(config, account, envelope, profile=False):
+    """Worker-lane job: handle one envelope, logging instead of raising."""
+    try:
+        with profiling.profile("signal", "listen", profile):
+            handle_envelope(config, envelope)
+    except Exception as e:
+        print(f"[{datetime.now()}] ERROR processing message for {account}: {e}", file=sys.stderr)
 
-    # 1. Store in signal DB
-    update_contact(db, sender, name)
-    db.execute("""
-        INSERT INTO messages (contact_number, direction, body, timestamp)
-        VALUES (?, 'in', ?, ?)
-    """, (sender, message[:8000], ts))
-
-    # 2. Write to atlas inbox
-    atlas_db = sqlite3.connect(ATLAS_DB_PATH)
-    atlas_db.execute("PRAGMA busy_timeout=5000")
-    cursor = atlas_db.execute(
-        "INSERT INTO messages (channel, sender, content) VALUES (?, ?, ?)",
-        ("signal", sender, message),
-    )
-    inbox_msg_id = cursor.lastrowid
-    atlas_db.commit()
-    atlas_db.close()
-
-    # Update signal DB with inbox reference
-    db.execute("UPDATE messages SET inbox_msg_id = ? WHERE rowid = last_insert_rowid()",
-               (inbox_msg_id,))
-    db.commit()
-    db.close()
 
-    # Touch .wake so main session picks up the message even if trigger.sh fails
-    Path(WAKE_PATH).touch()
+def listen_socket(get_config, path, numbers, executor, profile=False):
+    """Read JSON-RPC notifications from one daemon socket until the connection drops.
 
-    print(f"[{datetime.now()}] Signal from {sender}: {message[:80]}... (inbox={inbox_msg_id})")
+    Envelopes are handed to `executor` keyed by account and sender: each
+    conversation is processed in arrival order, different ones concurrently.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        print(f"[{datetime.now()}] Connected to signal-cli daemon {path} ({', '.join(numbers)})")
+        buf = b""
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                print(f"[{datetime.now()}] Connection closed by signal-cli daemon {path}")
+                return
+            buf += data
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                try:
+                    notification = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(notification, dict) or notification.get("method") != "receive":
+                    continue
+
+                config = get_config()
+                account = route_notification(config, numbers, notification)
+                if account is None:
+                    print(f"[{datetime.now()}] Ignoring message for unconfigured account "
+                          f"{(notification.get('params') or {}).get('account')!r}", file=sys.stderr)
+                    continue
+                envelope = (notification.get("params") or {}).get("envelope") or {}
+                sender = envelope.get("sourceNumber") or envelope.get("source", "")
+                executor.submit(f"{account}:{sender}", process_envelope,
+                                for_account(config, account), account, envelope, profile)
+
+
+def cmd_listen(get_config, profile=False):
+    """Serve every configured number from one process: one reader thread per daemon socket,
+    signal.lanes worker threads processing the messages.
+
+    Works with one multi-account daemon (`signal-cli daemon --socket`, routed by
+    the notification's account) and/or per-number daemons (signal.sockets).
+    """
+    config = get_config()
+    if not config["numbers"]:
+        print(f"[{datetime.now()}] ERROR: No Signal number configured", file=sys.stderr)
+        sys.exit(1)
+
+    # Worker lanes keyed by account + sender: one slow message only delays its own lane
+    executor = lanes.KeyedExecutor(config["lanes"], "signal-listen")
+
+    def run(path, numbers):
+        while True:
+            try:
+                listen_socket(get_config, path, numbers, executor, profile)
+            except OSError as e:
+                print(f"[{datetime.now()}] Socket {path} not available ({e})")
+            except Exception as e:
+                # A reader thread must never die: log, reconnect and keep serving its numbers
+                print(f"[{datetime.now()}] ERROR reading {path}: {e}", file=sys.stderr)
+            time.sleep(5)
+
+    def flush_loop():
+        # Batched and digest triggers come due between messages, too
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            executor.export()
+            cfg = get_config()
+            for number in cfg["numbers"]:
+                scoped = for_account(cfg, number)
+                db = get_signal_db(scoped)
+                try:
+                    channel_core.flush_deferred(db, SignalAdapter(scoped))
+                    partitions.maybe_archive(db, "messages", scoped["hot_months"])
+                except Exception as e:
+                    print(f"[{datetime.now()}] ERROR flushing deferred triggers for {number}: {e}",
+                          file=sys.stderr)
+                finally:
+                    db.close()
+
+    # Deliver what a previous run stored but never got to the inbox / trigger
+    for number in config["numbers"]:
+        scoped = for_account(config, number)
+        db = get_signal_db(scoped)
+        try:
+            channel_core.resume_journal(db, SignalAdapter(scoped))
+        finally:
+            db.close()
+
+    routes = listener_routes(config)
+    print(f"[{datetime.now()}] Signal listener starting "
+          f"({', '.join(f'{p}: {len(n)} number(s)' for p, n in routes.items())})")
+    threads = [threading.Thread(target=run, args=(path, numbers), daemon=True)
+               for path, numbers in routes.items()]
+    threads.append(threading.Thread(target=flush_loop, daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# --- INCOMING command (core: inject message into session) ---
 
-    # 3. Fire trigger (trigger.sh handles IPC socket injection vs new session)
-    payload = json.dumps({
-        "inbox_message_id": inbox_msg_id,
+class SignalAdapter(channel_core.ChannelAdapter):
+    """Stores incoming messages of one Signal number for the shared ingestion core."""
+
+    channel = "signal"
+    trigger_name = TRIGGER_NAME
+    record_table = "messages"
+
+    def __init__(self, config):
+        self.config = config  # scoped to the receiving number (for_account)
+        self.priority = config["priority_rules"]
+        self.digest_session_key = session_key_for(config, "low-priority-digest")
+
+    def store(self, db, message):
+        sender, body = message["sender"], message["body"]
+
+        # Store in signal DB, advancing the contact's context snapshot in the same transaction
+        update_contact(db, sender, message["name"])
+        context = push_contact_context(db, sender, compact_entry("in", body))
+        cursor = db.execute("""
+            INSERT INTO messages (contact_number, direction, body, timestamp)
+            VALUES (?, 'in', ?, ?)
+        """, (sender, body[:8000], message["timestamp"]))
+        print(f"[{datetime.now()}] Signal from {sender}: {body[:80]}...")
+
+        payload_data = {
+            "sender": sender,
+            "sender_name": message["name"],
+            "message": body[:PAYLOAD_MESSAGE_CHARS],
+            "timestamp": message["timestamp"],
+        }
+        if len(self.config["numbers"]) > 1:
+            payload_data["account"] = self.config["number"]  # reply with: signal send --account <account>
+        if context:
+            payload_data["context"] = context
+
+        timestamp = message["timestamp"]  # envelope time in ms; manual injections carry an ISO date
+        return {"id": cursor.lastrowid, "session_key": session_key_for(self.config, sender),
+                "sent_at": int(timestamp) / 1000 if timestamp.isdigit() else None,
+                "inbox_content": body, "payload": payload_data}
+
+
+def incoming_message(sender, message, name="", timestamp=""):
+    """Normalized message for the channel core.
+
+    Only envelope timestamps identify a message (redelivery after listener
+    reconnects, poll + daemon overlap); manual injections are never deduped.
+    """
+    return {
         "sender": sender,
-        "sender_name": name,
-        "message": message[:4000],
-        "timestamp": ts,
-    })
+        "dedupe_keys": [f"{sender}:{timestamp}"] if timestamp else [],
+        "summary": message,
+        "body": message,
+        "name": name,
+        "timestamp": timestamp or datetime.now().isoformat(),
+    }
 
+
+def ingest_incoming(db, config, messages):
+    """Store a batch of messages for one number, write them to the inbox, fire triggers."""
+    adapter = SignalAdapter(config)
+    record_ids = []
+    for message in messages:
+        if config["whitelist_set"] and message["sender"] not in config["whitelist_set"]:
+            print(f"Blocked: {message['sender']} not in whitelist", file=sys.stderr)
+            continue
+        record_id = channel_core.ingest(db, adapter, message)
+        if record_id is not None:
+            record_ids.append(record_id)
+    channel_core.deliver(db, adapter, record_ids)
+
+
+def cmd_incoming(config, sender, message, name="", timestamp=""):
+    """Inject an incoming message: store in DB, write to inbox, fire trigger."""
+    db = get_signal_db(config)
     try:
-        subprocess.Popen(
-            [TRIGGER_SCRIPT, TRIGGER_NAME, payload, sender],
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-    except Exception as e:
-        print(f"Failed to fire trigger: {e}", file=sys.stderr)
+        ingest_incoming(db, config, [incoming_message(sender, message, name, timestamp)])
+    finally:
+        db.close()
 
 
 # --- SEND command ---
 
-def _send_via_socket(to, message, attachments=None):
-    """Send via the running signal-cli daemon JSON-RPC socket."""
-    import socket as _socket
-    with _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM) as s:
+def _send_via_socket(path, to, message, attachments=None, account=None):
+    """Send via the running signal-cli daemon JSON-RPC socket (account: multi-account daemon)."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
         s.settimeout(30)
-        s.connect(DAEMON_SOCKET)
+        s.connect(path)
         params = {"recipient": [to], "message": message}
+        if account:
+            params["account"] = account
         if attachments:
             params["attachments"] = [os.path.abspath(f) for f in attachments]
         req = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "send", "params": params})
@@ -283,8 +561,11 @@ def cmd_send(config, to, message, attachments=None):
 
     db = get_signal_db(config)
     try:
-        if os.path.exists(DAEMON_SOCKET):
-            _send_via_socket(to, message, attachments)
+        path = daemon_socket_for(config)
+        if os.path.exists(path):
+            # A shared socket is a multi-account daemon: name the sending account
+            shared = number not in config["sockets"] and len(config["numbers"]) > 1
+            _send_via_socket(path, to, message, attachments, account=number if shared else None)
         else:
             _send_via_cli(number, to, message, attachments)
 
@@ -294,13 +575,16 @@ def cmd_send(config, to, message, attachments=None):
         if attachments:
             filenames = [os.path.basename(f) for f in attachments]
             stored_msg += f"\n[Attachments: {', '.join(filenames)}]"
-        db.execute("""
+        push_contact_context(db, to, compact_entry("out", stored_msg))
+        cursor = db.execute("""
             INSERT INTO messages (contact_number, direction, body, timestamp)
             VALUES (?, 'out', ?, ?)
         """, (to, stored_msg[:8000], datetime.now().isoformat()))
+        channel_core.record_reply(db, session_key_for(config, to), cursor.lastrowid)
         db.commit()
         att_info = f" (+{len(attachments)} attachment(s))" if attachments else ""
-        print(f"Signal message sent to {to}{att_info}")
+        via = f" from {number}" if len(config["numbers"]) > 1 else ""
+        print(f"Signal message sent to {to}{via}{att_info}")
     except Exception as e:
         print(f"ERROR: {e}", file=sys.stderr)
         sys.exit(1)
@@ -350,10 +634,10 @@ def cmd_history(config, contact_number, limit=20):
     print(f"Messages: {data['message_count']}, First seen: {data['first_seen']}")
     print()
 
-    messages = db.execute("""
-        SELECT direction, body, created_at
-        FROM messages WHERE contact_number = ? ORDER BY created_at DESC LIMIT ?
-    """, (contact_number, limit)).fetchall()
+    # Newest first; older months are only opened while the limit isn't reached
+    messages = partitions.scan(db, "messages", ("direction", "body", "created_at", "id"),
+                               "contact_number = ?", (contact_number,),
+                               since=data["first_seen"], limit=limit)
 
     for m in reversed(messages):
         direction = "\u2192" if m[0] == "out" else "\u2190"
@@ -364,65 +648,219 @@ def cmd_history(config, contact_number, limit=20):
     db.close()
 
 
+# --- EXPORT / IMPORT / BACKUP commands ---
+
+# Persistent tables in restore order
+TRANSFER_TABLES = ("contacts", "messages", "contact_context", "dedupe", "state")
+
+
+def cmd_export(config, output="-"):
+    """Stream the number's DB to NDJSON from one read snapshot (constant memory)."""
+    db = get_signal_db(config)
+    out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    try:
+        counts = dbtransfer.export_ndjson(
+            db, "signal", TRANSFER_TABLES, out,
+            partitions=[("messages", path) for _, path in partitions.partition_paths(db, "messages")])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        db.close()
+    summary = ", ".join(f"{t}={n}" for t, n in counts.items())
+    print(f"[{datetime.now()}] Exported {summary}", file=sys.stderr)
+
+
+def cmd_import(config, path):
+    """Load an NDJSON export into the number's DB in batches (safe while listening)."""
+    db = get_signal_db(config)
+    fp = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        counts = dbtransfer.import_ndjson(db, "signal", TRANSFER_TABLES, fp)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+        db.close()
+    for table, (inserted, skipped) in counts.items():
+        print(f"{table}: {inserted} imported, {skipped} already present")
+
+
+def cmd_backup(config, dest):
+    """Copy the number's DB with the SQLite online backup API while ingestion continues."""
+    db = get_signal_db(config)
+    try:
+        size = dbtransfer.online_backup(db, dest)
+        parts = dbtransfer.backup_partitions([p for _, p in partitions.partition_paths(db, "messages")], dest)
+    finally:
+        db.close()
+    print(f"[{datetime.now()}] Backup written to {dest} ({size} bytes, {parts} partition file(s))")
+
+
+# --- LATENCY command ---
+
+def cmd_latency(config, all_numbers=True, days=30, top=10):
+    """Message-to-reply latency over every configured number (or just config's one)."""
+    numbers = config["numbers"] if all_numbers and config["numbers"] else [config["number"]]
+    dbs = [get_signal_db(for_account(config, number)) for number in numbers]
+    try:
+        latency.report("signal", dbs, days=days, top=top)
+    finally:
+        for db in dbs:
+            db.close()
+
+
+# --- PARTITIONS command ---
+
+def cmd_partitions(config, archive=False, hot_months=None):
+    """List the number's monthly partitions; with archive=True move old months out first."""
+    db = get_signal_db(config)
+    try:
+        if archive:
+            months = hot_months or config["hot_months"] or 1
+            done = partitions.archive(db, "messages", months)
+            print(f"Archived {sum(n for _, n in done)} message(s) in {len(done)} month(s) "
+                  f"(keeping {months} month(s) hot)\n")
+        partitions.print_catalog(db, "messages")
+    finally:
+        db.close()
+
+
 # --- Main CLI ---
 
-def main():
+def main(argv=None, config=None):
     parser = argparse.ArgumentParser(
         description="Atlas Signal Add-on",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Examples:
+  signal-addon.py listen                             # Daemon socket listener (all numbers)
   signal-addon.py poll --once                        # Check signal-cli once
   signal-addon.py poll                               # Continuous polling
   signal-addon.py incoming +49170123 "Hello!"        # Inject incoming message
   signal-addon.py send +49170123 "Hi!"               # Send outgoing message
   signal-addon.py contacts                           # List contacts
   signal-addon.py history +49170123                  # Conversation history
+  signal-addon.py send --account +49170999 +49170123 "Hi!"   # Send from another line
+  signal-addon.py export --account +49170999 --output signal.ndjson
+  signal-addon.py backup /backups/signal.db
+  signal-addon.py partitions --archive               # Move old months out of the hot DB
+  signal-addon.py --profile listen                   # Profile every handled message
+  signal-addon.py profile-summary --label listen
         """,
     )
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the command / each poll cycle / each message (also: ATLAS_PROFILE=1)")
     sub = parser.add_subparsers(dest="command", required=True)
 
+    # --account: which configured number (default: signal.number, the primary)
+    account_opt = argparse.ArgumentParser(add_help=False)
+    account_opt.add_argument("--account", default="", metavar="NUMBER",
+                             help="Own Signal number to use (default: primary number)")
+
+    # listen — signal-cli daemon socket(s)
+    sub.add_parser("listen", help="Listen on the signal-cli daemon socket(s) for all numbers")
+
     # poll — fetch from signal-cli
-    p_poll = sub.add_parser("poll", help="Poll signal-cli for new messages")
+    p_poll = sub.add_parser("poll", parents=[account_opt],
+                            help="Poll signal-cli for new messages (all numbers unless --account)")
     p_poll.add_argument("--once", action="store_true", help="Check once and exit")
 
     # incoming — inject a message directly
-    p_in = sub.add_parser("incoming", help="Inject an incoming message")
+    p_in = sub.add_parser("incoming", parents=[account_opt], help="Inject an incoming message")
     p_in.add_argument("sender", help="Sender phone number")
     p_in.add_argument("message", help="Message text")
     p_in.add_argument("--name", default="", help="Sender display name")
     p_in.add_argument("--timestamp", default="", help="Message timestamp")
 
     # send
-    p_send = sub.add_parser("send", help="Send a Signal message")
+    p_send = sub.add_parser("send", parents=[account_opt], help="Send a Signal message")
     p_send.add_argument("number", help="Recipient phone number")
     p_send.add_argument("message", help="Message text")
     p_send.add_argument("--attach", action="append", default=[], metavar="FILE",
                          help="Attach a file (image, PDF, etc.). Can be repeated.")
 
     # contacts
-    p_contacts = sub.add_parser("contacts", help="List known contacts")
+    p_contacts = sub.add_parser("contacts", parents=[account_opt], help="List known contacts")
     p_contacts.add_argument("--limit", type=int, default=20)
 
     # history
-    p_history = sub.add_parser("history", help="Message history with a contact")
+    p_history = sub.add_parser("history", parents=[account_opt],
+                               help="Message history with a contact")
     p_history.add_argument("number", help="Contact phone number")
     p_history.add_argument("--limit", type=int, default=20)
 
-    args = parser.parse_args()
-    config = load_config()
+    # export / import / backup
+    p_export = sub.add_parser("export", parents=[account_opt], help="Stream the number's DB as NDJSON")
+    p_export.add_argument("--output", default="-", metavar="FILE", help="Output file (default: stdout)")
+    p_import = sub.add_parser("import", parents=[account_opt], help="Load an NDJSON export")
+    p_import.add_argument("file", help="Export file, or - for stdin")
+    p_backup = sub.add_parser("backup", parents=[account_opt], help="Online backup of the number's DB")
+    p_backup.add_argument("dest", help="Destination database file")
+
+    # partitions
+    p_parts = sub.add_parser("partitions", parents=[account_opt], help="List / archive monthly partitions")
+    p_parts.add_argument("--archive", action="store_true",
+                         help="Move months older than the hot window into partition files")
+    p_parts.add_argument("--hot-months", type=int, default=None, metavar="N",
+                         help="Months kept in the hot DB (default: signal.hot_months, else 1)")
+
+    # latency
+    p_latency = sub.add_parser("latency", parents=[account_opt],
+                               help="Message-to-reply latency report (p50/p95/p99)")
+    latency.add_report_args(p_latency)
+
+    # profile-summary
+    p_prof = sub.add_parser("profile-summary", help="Summarize recent --profile runs")
+    profiling.add_summary_args(p_prof)
+
+    args = parser.parse_args(argv)
+    if args.command == "profile-summary":
+        profiling.summary("signal", runs=args.runs, top=args.top, label=args.label, sort=args.sort)
+        return
+
+    watcher = None
+    if config is None:
+        watcher = ConfigWatcher()
+        config = watcher.get()
+
+    profile = profiling.requested(args.profile)
+
+    if args.command == "listen":
+        cmd_listen(watcher.get if watcher else lambda: config, profile)
+        return
+
+    try:
+        scoped = for_account(config, args.account)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
 
     if args.command == "poll":
+        def poll_all(cfg):
+            for number in [args.account] if args.account else cfg["numbers"] or [""]:
+                cmd_poll(for_account(cfg, number), once=True)
+
         if args.once:
-            cmd_poll(config, once=True)
+            with profiling.profile("signal", "poll", profile):
+                poll_all(config)
         else:
             interval = int(os.environ.get("SIGNAL_POLL_INTERVAL", 5))
             print(f"[{datetime.now()}] Signal polling starting "
-                  f"(number={config['number']}, interval={interval}s)")
+                  f"(numbers={', '.join(config['numbers']) or '-'}, interval={interval}s)")
             while True:
-                cmd_poll(config, once=True)
+                with profiling.profile("signal", "poll", profile):
+                    poll_all(watcher.get() if watcher else config)
                 time.sleep(interval)
-    elif args.command == "incoming":
+        return
+
+    with profiling.profile("signal", args.command, profile):
+        run_command(scoped, args)
+
+
+def run_command(config, args):
+    if args.command == "incoming":
         cmd_incoming(config, args.sender, args.message,
                      name=args.name, timestamp=args.timestamp)
     elif args.command == "send":
@@ -431,6 +869,16 @@ Examples:
         cmd_contacts(config, limit=args.limit)
     elif args.command == "history":
         cmd_history(config, args.number, limit=args.limit)
+    elif args.command == "export":
+        cmd_export(config, args.output)
+    elif args.command == "import":
+        cmd_import(config, args.file)
+    elif args.command == "backup":
+        cmd_backup(config, args.dest)
+    elif args.command == "partitions":
+        cmd_partitions(config, archive=args.archive, hot_months=args.hot_months)
+    elif args.command == "latency":
+        cmd_latency(config, all_numbers=not args.account, days=args.days, top=args.top)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Trigger launcher for Atlas.
+
+Spawns a trigger's own Claude session (read-only, filter/escalation), or — for
+persistent triggers whose session is already running — injects the event
+into that session through its Claude Code IPC socket.
+
+CLI (what trigger.sh execs; blocks until the session finishes):
+  trigger.py <trigger-name> [payload] [session-key]
+  trigger.py <trigger-name> --payload-file <file|-> [session-key]
+
+Library (used in-process by the email/Signal add-ons; never blocks on Claude):
+  import trigger
+  trigger.fire("signal-chat", payload, session_key="+49170123456")
+
+The trigger row is read once per event, prompt templates from app/prompts are
+cached per process (reloaded when the file changes), and IPC injection happens
+natively — no sqlite3/jq/python3 helper processes. Only a session spawn starts
+a new process: a detached `trigger.py --run <spool-file>` that runs Claude and
+records the session ID and metrics.
+
+Payloads never travel through argv (ARG_MAX, visible in `ps`): CLI callers can
+hand them over with --payload-file (or on stdin with `-`), the rendered prompt
+for a detached run is written once to a private spool file in ~/.index/trigger-spool
+that the runner reads and deletes, and Claude receives the prompt on stdin.
+
+Session key determines WHICH session to resume for persistent triggers:
+  - Email: thread ID       → trigger.py email-handler '{"body":"..."}' 'thread-4821'
+  - Signal: sender number  → trigger.py signal-chat '{"msg":"Hi"}' '+49170123456'
+  - No key + persistent    → uses "_default" (one global session per trigger)
+  - Ephemeral triggers     → key is ignored, always a new session
+"""
+
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+DB_PATH = os.environ["HOME"] + "/.index/atlas.db"
+WORKSPACE = os.environ["HOME"]
+PROMPT_DIR = "/atlas/app/prompts"
+LOG_DIR = "/atlas/logs"
+CLAUDE_JSON = os.environ["HOME"] + "/.claude.json"
+SPOOL_DIR = os.environ["HOME"] + "/.index/trigger-spool"
+DEFAULT_SESSION_KEY = "_default"
+
+PLACEHOLDER_RE = re.compile(r"\{\{(payload|sender|channel|trigger_name)\}\}")
+
+
+def log(trigger_name, msg, echo=False):
+    line = f"[{datetime.now()}] {msg}"
+    try:
+        with open(os.path.join(LOG_DIR, f"trigger-{trigger_name}.log"), "a") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+    if echo:
+        print(line, flush=True)
+
+
+def utc_now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def connect_db():
+    db = sqlite3.connect(DB_PATH)
+    db.execute("PRAGMA busy_timeout=5000")
+    return db
+
+
+# --- Prompt templates ---
+
+_template_cache = {}  # path -> (mtime_ns, text)
+
+
+def load_template(path):
+    """Read a prompt template, cached until the file changes. None if missing."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _template_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        text = f.read()
+    _template_cache[path] = (mtime, text)
+    return text
+
+
+def render(template, **values):
+    """Substitute {{placeholders}} in one pass (payload content is never re-expanded)."""
+    return PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], template)
+
+
+# --- Trigger lookup ---
+
+def load_trigger(db, name):
+    """Read the trigger row once. None if not found."""
+    row = db.execute("""
+        SELECT channel, prompt, session_mode, enabled FROM triggers WHERE name = ? LIMIT 1
+    """, (name,)).fetchone()
+    if not row:
+        return None
+    channel, prompt, session_mode, enabled = row
+    return {
+        "name": name,
+        "channel": channel or "internal",
+        "prompt": prompt or "",
+        "session_mode": session_mode or "ephemeral",
+        "enabled": enabled == 1,
+    }
+
+
+def find_session(db, name, session_key):
+    row = db.execute("""
+        SELECT session_id FROM trigger_sessions
+        WHERE trigger_name = ? AND session_key = ? LIMIT 1
+    """, (name, session_key)).fetchone()
+    return row[0] if row else ""
+
+
+# --- IPC injection ---
+
+def inject(session_id, text):
+    """Send a message into a running session via its IPC socket. False if not reachable."""
+    path = f"/tmp/claudec-{session_id}.sock"
+    if not os.path.exists(path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(5)
+            s.connect(path)
+            s.sendall(json.dumps({"action": "send", "text": text, "submit": True}).encode() + b"\n")
+        return True
+    except OSError:
+        return False
+
+
+def build_inject_message(trig, session_key, payload, prompt):
+    # Same lookup as trigger.sh: channel-specific inject template, then the generic one
+    for candidate in (f"{PROMPT_DIR}/trigger-{trig['channel']}-inject.md",
+                      f"{PROMPT_DIR}/trigger-inject.md"):
+        template = load_template(candidate)
+        if template is not None:
+            return render(template, trigger_name=trig["name"], channel=trig["channel"],
+                          sender=session_key, payload=payload or prompt)
+    return (f"New message arrived:\n\n{payload or prompt}\n\n"
+            "Process this message using the channel CLI tools (signal send / email reply) as appropriate.")
+
+
+# --- Fire ---
+
+def fire(name, payload="", session_key=None, wait=False, echo=False):
+    """Fire a trigger for one event.
+
+    Injects into the running session when possible; otherwise starts a Claude
+    session — detached (wait=False, the add-on path) or in this process
+    (wait=True, the CLI path). Returns "injected", "spawned", "ran",
+    "disabled" or "missing".
+    """
+    if not isinstance(payload, str):
+        payload = json.dumps(payload)
+    session_key = session_key or DEFAULT_SESSION_KEY
+
+    if not os.path.exists(DB_PATH):
+        print(f"[{datetime.now()}] ERROR: Database not found: {DB_PATH}", file=sys.stderr)
+        return "missing"
+
+    db = connect_db()
+    try:
+        trig = load_trigger(db, name)
+        if trig is None:
+            print(f"[{datetime.now()}] Trigger not found: {name}", file=sys.stderr)
+            return "missing"
+        if not trig["enabled"]:
+            log(name, f"Trigger disabled: {name}", echo)
+            return "disabled"
+
+        # Fallback: load prompt from workspace file
+        prompt_template = trig["prompt"]
+        if not prompt_template:
+            prompt_template = load_template(f"{WORKSPACE}/triggers/{name}/prompt.md")
+            if prompt_template is None:
+                prompt_template = f"Trigger '{name}' was fired."
+        prompt = render(prompt_template, payload=payload, sender=session_key,
+                        channel=trig["channel"], trigger_name=name)
+
+        db.execute("""
+            UPDATE triggers SET last_run = datetime('now'), run_count = run_count + 1
+            WHERE name = ?
+        """, (name,))
+        db.commit()
+
+        existing_session = ""
+        if trig["session_mode"] == "persistent":
+            existing_session = find_session(db, name, session_key)
+    finally:
+        db.close()
+
+    # --- Persistent session: try IPC socket injection first ---
+    if existing_session:
+        if inject(existing_session, build_inject_message(trig, session_key, payload, prompt)):
+            log(name, f"Injected into running session {existing_session} (key={session_key})", echo)
+            return "injected"
+        if os.path.exists(f"/tmp/claudec-{existing_session}.sock"):
+            log(name, f"Stale socket for {existing_session}, spawning new session", echo)
+
+    if wait:
+        run_session(name, trig["channel"], trig["session_mode"], session_key,
+                    existing_session, prompt, echo=echo)
+        return "ran"
+
+    spool_path = write_spool({
+        "name": name, "channel": trig["channel"], "session_mode": trig["session_mode"],
+        "session_key": session_key, "existing_session": existing_session, "prompt": prompt,
+    })
+    try:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--run", spool_path],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        os.unlink(spool_path)
+        raise
+    return "spawned"
+
+
+# --- Spool files ---
+
+def write_spool(job):
+    """Write a detached run's arguments to a private spool file. Returns its path."""
+    os.makedirs(SPOOL_DIR, mode=0o700, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{job['name']}-", suffix=".json", dir=SPOOL_DIR)
+    with os.fdopen(fd, "w") as f:  # mkstemp creates the file with mode 0600
+        json.dump(job, f)
+    return path
+
+
+def read_spool(path):
+    """Load and remove a spool file written by write_spool."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def read_payload_file(path):
+    """Read a CLI payload from a file, or from stdin for "-"."""
+    if path == "-":
+        return sys.stdin.read()
+    with open(path) as f:
+        return f.read()
+
+
+# --- Session run ---
+
+def disable_remote_mcp():
+    """Disable remote MCP connectors that hang on startup."""
+    try:
+        with open(CLAUDE_JSON) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    features = data.setdefault("cachedGrowthBookFeatures", {})
+    if features.get("tengu_claudeai_mcp_connectors") is False:
+        return
+    features["tengu_claudeai_mcp_connectors"] = False
+    tmp = CLAUDE_JSON + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, CLAUDE_JSON)
+
+
+def save_session_metrics(db, result, name, started, ended):
+    usage = result.get("usage") or {}
+    db.execute("""
+        INSERT OR IGNORE INTO session_metrics
+          (session_type, session_id, trigger_name, started_at, ended_at,
+           duration_ms, input_tokens, output_tokens, cache_read_tokens,
+           cache_creation_tokens, cost_usd, num_turns, is_error)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, (
+        "trigger",
+        result.get("session_id", "") or "",
+        name,
+        started, ended,
+        int(result.get("duration_ms") or 0),
+        int(usage.get("input_tokens") or 0),
+        int(usage.get("output_tokens") or 0),
+        int(usage.get("cache_read_input_tokens") or 0),
+        int(usage.get("cache_creation_input_tokens") or 0),
+        float(result.get("total_cost_usd") or result.get("cost_usd") or 0),
+        int(result.get("num_turns") or 0),
+        0,
+    ))
+
+
+def run_session(name, channel, session_mode, session_key, existing_session, prompt, echo=False):
+    """Run the trigger's own Claude session to completion and record session + metrics."""
+    log(name, f"Trigger firing: {name} (mode={session_mode}, key={session_key}, channel={channel})", echo)
+    started = utc_now()
+
+    disable_remote_mcp()
+    args = ["claude-atlas", "--mode", "trigger", "-p", "--dangerously-skip-permissions"]
+    if session_mode == "persistent" and existing_session:
+        args += ["--resume", existing_session]
+        log(name, f"Resuming session for key={session_key}: {existing_session}", echo)
+    elif session_mode == "persistent":
+        log(name, f"New persistent session for key={session_key}", echo)
+    args += ["--output-format", "json"]  # prompt goes in on stdin, not argv
+
+    # ATLAS_TRIGGER env var tells hooks this is a trigger session (read-only).
+    # Unset CLAUDECODE so spawning a trigger session while a worker is running doesn't fail
+    # with "Claude Code cannot be launched inside another Claude Code session".
+    env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+    env.update(ATLAS_TRIGGER=name, ATLAS_TRIGGER_CHANNEL=channel, ATLAS_TRIGGER_SESSION_KEY=session_key)
+
+    # --output-format json reliably captures the session ID (no race with concurrent triggers)
+    try:
+        err = open(os.path.join(LOG_DIR, f"trigger-{name}.log"), "ab")
+    except OSError:
+        err = subprocess.DEVNULL
+    with tempfile.TemporaryFile() as out:
+        try:
+            subprocess.run(args, input=prompt.encode(), stdout=out, stderr=err, env=env)
+        except OSError as e:
+            log(name, f"Failed to start claude-atlas: {e}", echo)
+        finally:
+            if err is not subprocess.DEVNULL:
+                err.close()
+        out.seek(0)
+        try:
+            result = json.loads(out.read() or b"{}")
+        except ValueError:
+            result = {}
+
+    log(name, result.get("result", "") or "")
+    ended = utc_now()
+
+    db = connect_db()
+    try:
+        new_session_id = result.get("session_id", "")
+        if session_mode == "persistent" and new_session_id:
+            db.execute("""
+                INSERT INTO trigger_sessions (trigger_name, session_key, session_id)
+                VALUES (?, ?, ?)
+                ON CONFLICT(trigger_name, session_key) DO UPDATE SET
+                    session_id = excluded.session_id, updated_at = datetime('now')
+            """, (name, session_key, new_session_id))
+            log(name, f"Saved session for key={session_key}: {new_session_id}", echo)
+        save_session_metrics(db, result, name, started, ended)
+        db.commit()
+    finally:
+        db.close()
+
+    log(name, f"Trigger done: {name} (key={session_key})", echo)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == "--run":
+        # Detached session runner started by fire(wait=False)
+        job = read_spool(argv[1])
+        run_session(job["name"], job["channel"], job["session_mode"], job["session_key"],
+                    job["existing_session"], job["prompt"])
+        return 0
+
+    payload_file = None
+    if "--payload-file" in argv:
+        i = argv.index("--payload-file")
+        if i + 1 >= len(argv):
+            print("ERROR: --payload-file needs a path (or - for stdin)", file=sys.stderr)
+            return 1
+        payload_file = argv[i + 1]
+        argv = argv[:i] + argv[i + 2:]
+
+    if not argv:
+        print("Usage: trigger.py <trigger-name> [payload | --payload-file <file|->] [session-key]",
+              file=sys.stderr)
+        return 1
+
+    name, rest = argv[0], argv[1:]
+    if payload_file is not None:
+        payload = read_payload_file(payload_file)
+    else:
+        payload = rest.pop(0) if rest else ""
+    session_key = rest[0] if rest else DEFAULT_SESSION_KEY
+    outcome = fire(name, payload, session_key, wait=True, echo=True)
+    return 1 if outcome == "missing" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -104,9 +104,10 @@ Relay this result to the original sender now."
       echo "[$(date)] Resuming trigger $TRIGGER_NAME (session=$SESSION_ID)" | tee -a "$LOG"
       RELAY_START=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
       RELAY_OUT=$(mktemp /tmp/relay-out-XXXXXX.json)
-      ATLAS_TRIGGER="$TRIGGER_NAME" ATLAS_TRIGGER_CHANNEL="$CHANNEL" ATLAS_TRIGGER_SESSION_KEY="$SESSION_KEY" \
+      printf '%s' "$RESUME_MSG" | \
+        ATLAS_TRIGGER="$TRIGGER_NAME" ATLAS_TRIGGER_CHANNEL="$CHANNEL" ATLAS_TRIGGER_SESSION_KEY="$SESSION_KEY" \
         claude-atlas --mode trigger --output-format json --resume "$SESSION_ID" \
-        --dangerously-skip-permissions -p "$RESUME_MSG" > "$RELAY_OUT" 2>>"$LOG" || true
+        --dangerously-skip-permissions -p > "$RELAY_OUT" 2>>"$LOG" || true
       RELAY_EXIT=$?
       RELAY_END=$(date -u +"%Y-%m-%dT%H:%M:%SZ")
       python3 -c "
@@ -118,7 +119,7 @@ except: pass
       rm -f "$RELAY_OUT"
     elif [ -n "$TRIGGER_NAME" ]; then
       echo "[$(date)] No session ID for $TRIGGER_NAME — re-spawning via trigger.sh" | tee -a "$LOG"
-      /atlas/app/triggers/trigger.sh "$TRIGGER_NAME" "$RESUME_MSG" "$SESSION_KEY" 2>&1 | tee -a "$LOG" || true
+      printf '%s' "$RESUME_MSG" | /atlas/app/triggers/trigger.sh "$TRIGGER_NAME" --payload-file - "$SESSION_KEY" 2>&1 | tee -a "$LOG" || true
     fi
 
     echo "[$(date)] Trigger $TRIGGER_NAME re-awakening done" | tee -a "$LOG"
@@ -679,8 +679,10 @@ app.post("/api/webhook/:name", async (c) => {
     payload = "(could not parse payload)";
   }
 
-  // Fire through trigger.sh for consistent behavior (session_mode, prompts, IPC)
-  Bun.spawn(["/atlas/app/triggers/trigger.sh", t.name, payload], {
+  // Fire through trigger.sh for consistent behavior (session_mode, prompts, IPC).
+  // Payload goes over stdin, not argv (size limit, visible in ps).
+  Bun.spawn(["/atlas/app/triggers/trigger.sh", t.name, "--payload-file", "-"], {
+    stdin: new Blob([payload]),
     stdout: "ignore",
     stderr: "ignore",
   });
@@ -955,12 +957,13 @@ app.post("/chat", async (c) => {
   const payload = JSON.stringify({
     inbox_message_id: msg.id,
     sender: "web-ui",
-    message: content.slice(0, 4000),
+    message: content.slice(0, 8000),
     timestamp: msg.created_at,
   });
   Bun.spawn(
-    ["/atlas/app/triggers/trigger.sh", "web-chat", payload, "_default"],
+    ["/atlas/app/triggers/trigger.sh", "web-chat", "--payload-file", "-", "_default"],
     {
+      stdin: new Blob([payload]),
       stdout: "ignore",
       stderr: "ignore",
     },